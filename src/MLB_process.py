@@ -3,17 +3,23 @@
 
 # Imports
 import os
-import json
 import time
+import asyncio
 import logging
+import hashlib
+import functools
+import httpx
+import numpy as np
+import orjson
 from dotenv import load_dotenv
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.documentintelligence import DocumentIntelligenceClient
 from azure.ai.documentintelligence.models import DocumentAnalysisFeature
 from langchain.docstore.document import Document
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI
 from tqdm import tqdm
 import re
+from src.validate import CURRENCY_STRIP
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -27,15 +33,30 @@ DEPLOYMENT_NAME = os.getenv("DEPLOYMENT_NAME")
 DOC_INTELLIGENCE_ENDPOINT = os.getenv("DOC_INTELLIGENCE_ENDPOINT")
 DOC_INTELLIGENCE_KEY = os.getenv("DOC_INTELLIGENCE_KEY")
 
+# Upper bound on in-flight Azure OpenAI requests, keeps bursts under the TPM/RPM quota
+MAX_CONCURRENT_REQUESTS = 10
+# Connection pool size for the shared HTTP client, sized well above the request fan-out
+HTTP_POOL_SIZE = 64
+# On-disk cache of LLM responses keyed by a hash of the full request
+LLM_CACHE_DIR = os.path.join("data", ".llm_cache")
+
+# Precompiled patterns used on every chunk
+SERVICE_LOCATION_RE = re.compile(r'Service Location \d+ of \d+')
+
 # Function definitions
+@functools.lru_cache(maxsize=4)
+def get_di_client(di_endpoint, di_key):
+    """Return the shared Document Intelligence client for the given credentials."""
+    return DocumentIntelligenceClient(
+        endpoint=di_endpoint,
+        credential=AzureKeyCredential(di_key)
+    )
+
 def document_layout_analysis(document_path, di_endpoint=DOC_INTELLIGENCE_ENDPOINT, di_key=DOC_INTELLIGENCE_KEY):
     """Analyze document layout using Azure Document Intelligence."""
     logger.info(f"Starting document analysis for {document_path}")
     start_time = time.time()
-    doc_intelligence_client = DocumentIntelligenceClient(
-        endpoint=di_endpoint,
-        credential=AzureKeyCredential(di_key)
-    )
+    doc_intelligence_client = get_di_client(di_endpoint, di_key)
     features = [DocumentAnalysisFeature.STYLE_FONT] if document_path.endswith('.pdf') else []
     
     with open(document_path, "rb") as f:
@@ -55,16 +76,25 @@ def apply_tags_to_content(content, styles):
     """Apply bold tags to content based on style information."""
     logger.info("Applying style tags to content")
     start_time = time.time()
-    tagged_content = content
-    for style in styles:
-        for span in style.get('spans', []):
-            offset, length = span['offset'], span['length']
-            if style.get('fontWeight') == 'bold':
-                tagged_content = (
-                    tagged_content[:offset] +
-                    f"<b>{tagged_content[offset:offset + length]}</b>" +
-                    tagged_content[offset + length:]
-                )
+    # Span offsets refer to the untagged content, so build the output in one pass
+    spans = sorted(
+        (span['offset'], span['length'])
+        for style in styles if style.get('fontWeight') == 'bold'
+        for span in style.get('spans', [])
+    )
+    parts = []
+    pos = 0
+    for offset, length in spans:
+        if offset < pos:
+            # Skip spans overlapping one that is already tagged
+            continue
+        parts.append(content[pos:offset])
+        parts.append("<b>")
+        parts.append(content[offset:offset + length])
+        parts.append("</b>")
+        pos = offset + length
+    parts.append(content[pos:])
+    tagged_content = "".join(parts)
     end_time = time.time()
     logger.info(f"Style tags applied in {end_time - start_time:.2f} seconds")
     return tagged_content
@@ -74,19 +104,16 @@ def semantic_chunking(document, file_name):
     logger.info("Starting semantic chunking")
     start_time = time.time()
     content = apply_tags_to_content(document['content'], document.get('styles', [])) if 'styles' in document else document['content']
-    # Find all service location headers
-    headers = list(re.finditer(r'Service Location \d+ of \d+', content))
+    # Find the start offset of every service location header
+    starts = [match.start() for match in SERVICE_LOCATION_RE.finditer(content)]
     chunks = []
-    if headers:
+    if starts:
         # First chunk: content before the first header
-        if headers[0].start() > 0:
-            chunks.append(Document(page_content=content[:headers[0].start()].strip(), metadata={"source": f"{file_name}.md"}))
+        if starts[0] > 0:
+            chunks.append(Document(page_content=content[:starts[0]].strip(), metadata={"source": f"{file_name}.md"}))
         # Chunks for each service location
-        for i in range(len(headers)):
-            start = headers[i].start()
-            end = headers[i+1].start() if i+1 < len(headers) else len(content)
-            chunk_content = content[start:end].strip()
-            chunks.append(Document(page_content=chunk_content, metadata={"source": f"{file_name}.md"}))
+        for start, end in zip(starts, starts[1:] + [len(content)]):
+            chunks.append(Document(page_content=content[start:end].strip(), metadata={"source": f"{file_name}.md"}))
     else:
         # If no headers found, use the entire content
         chunks.append(Document(page_content=content.strip(), metadata={"source": f"{file_name}.md"}))
@@ -94,22 +121,74 @@ def semantic_chunking(document, file_name):
     logger.info(f"Semantic chunking completed in {end_time - start_time:.2f} seconds. Number of chunks: {len(chunks)}")
     return chunks
 
-def get_aoai_response(query, force_json=False, prompt_file="prompt.json"):
-    """Get response from Azure OpenAI model."""
-    logger.info("Requesting response from Azure OpenAI")
-    start_time = time.time()
-    client = AzureOpenAI(
+@functools.lru_cache(maxsize=1)
+def get_aoai_client():
+    """Return the shared Azure OpenAI client, created on first use."""
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=HTTP_POOL_SIZE, max_keepalive_connections=HTTP_POOL_SIZE),
+        timeout=httpx.Timeout(120.0, connect=10.0)
+    )
+    return AsyncAzureOpenAI(
         azure_endpoint=AZURE_OPENAI_ENDPOINT,
         api_key=AZURE_OPENAI_API_KEY,
-        api_version="2024-02-01"
+        api_version="2024-02-01",
+        http_client=http_client
     )
-    
+
+@functools.lru_cache(maxsize=8)
+def load_prompt_prefix(prompt_file):
+    """Read a prompt file once and return it with the chunk separator appended."""
     with open(prompt_file, "r", encoding="utf-8") as file:
         prompt_base = file.read().strip()
+    return prompt_base + "\n\nDocument chunk: "
+
+def get_cache_key(prompt, force_json=False):
+    """Build the response cache key from everything that affects the model output."""
+    key_source = f"{DEPLOYMENT_NAME}\0{force_json}\0{prompt}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+def read_cached_response(key):
+    """Return the cached LLM response for a key, or None on a miss."""
+    cache_path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path, "rb") as f:
+            return orjson.loads(f.read())["response"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_cached_response(key, response):
+    """Store an LLM response in the cache; failures are logged and ignored."""
+    cache_path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps({"response": response}))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write LLM cache entry {key}: {str(e)}")
+
+async def get_aoai_response(query, force_json=False, prompt_file="prompt.json"):
+    """
+    Get response from Azure OpenAI model, reusing cached responses for identical requests.
+
+    Returns (content, cache_key). cache_key is None for a cached answer; otherwise the
+    caller stores the answer under it once it has checked that the answer parses.
+    """
+    prompt = load_prompt_prefix(prompt_file) + query
+    
+    # Extraction runs at temperature 0, so an identical prompt yields a reusable answer
+    cache_key = get_cache_key(prompt, force_json)
+    cached = read_cached_response(cache_key)
+    if cached is not None:
+        logger.info("Azure OpenAI response served from cache")
+        return cached, None
     
-    prompt = prompt_base + "\n\nDocument chunk: " + query
+    logger.info("Requesting response from Azure OpenAI")
+    start_time = time.time()
+    client = get_aoai_client()
     
-    response = client.chat.completions.create(
+    response = await client.chat.completions.create(
         model=DEPLOYMENT_NAME,
         messages=[{"role": "user", "content": prompt}],
         temperature=0.0,
@@ -117,21 +196,84 @@ def get_aoai_response(query, force_json=False, prompt_file="prompt.json"):
     )
     end_time = time.time()
     logger.info(f"Azure OpenAI response received in {end_time - start_time:.2f} seconds")
-    return response.choices[0].message.content
+    return response.choices[0].message.content, cache_key
 
 def clean_llm_response(response, force_json=False):
     """Clean the LLM response, extracting JSON if not forced."""
     if force_json:
         return response
-    json_match = re.search(r'\[.*\]', response, re.DOTALL)
-    return json_match.group(0) if json_match else response
+    stripped = response.strip()
+    if stripped.startswith('[') and stripped.endswith(']'):
+        return stripped
+    # Same span the greedy r'\[.*\]' search matched: first '[' through last ']'
+    start = response.find('[')
+    end = response.rfind(']')
+    return response[start:end + 1] if start != -1 and end > start else response
 
-def get_llm_response(query, force_json=False, prompt_file="prompt.json"):
+async def get_llm_response(query, force_json=False, prompt_file="prompt.json"):
     """Wrapper function to get and clean LLM response."""
-    response = get_aoai_response(query, force_json, prompt_file)
-    return clean_llm_response(response, force_json)
+    content, cache_key = await get_aoai_response(query, force_json, prompt_file)
+    response = clean_llm_response(content, force_json)
+    if cache_key is not None:
+        # Only cache an answer that parses; a malformed one would otherwise be
+        # replayed on every later run and its chunk never retried
+        try:
+            parse_extraction(response)
+            write_cached_response(cache_key, content)
+        except ValueError as e:
+            logger.warning("Not caching malformed Azure OpenAI response: %s", e)
+    return response
 
-def main():
+async def get_llm_response_bounded(semaphore, query, force_json=False, prompt_file="prompt.json"):
+    """Get a cleaned LLM response while holding a slot of the concurrency semaphore."""
+    async with semaphore:
+        return await get_llm_response(query, force_json, prompt_file)
+
+def parse_extraction(response):
+    """
+    Decode one chunk response into (master_account, sub_accounts) with a fixed shape.
+
+    A missing or null master_account becomes {} and a missing sub_accounts becomes [],
+    so callers never re-check types; anything else off-schema raises ValueError.
+    """
+    data = orjson.loads(response)
+    if not isinstance(data, dict):
+        raise ValueError(f"expected a JSON object, got {type(data).__name__}")
+    master = data.get("master_account") or {}
+    subs = data.get("sub_accounts") or []
+    if not isinstance(master, dict):
+        raise ValueError("master_account is not an object")
+    if not isinstance(subs, list) or not all(isinstance(sub, dict) for sub in subs):
+        raise ValueError("sub_accounts is not a list of objects")
+    for sub in subs:
+        if not isinstance(sub.get("line_items") or [], list):
+            raise ValueError("line_items is not a list")
+    return master, subs
+
+def fill_missing_totals(sub_accounts):
+    """Set total_due from the line-item totals on every sub-account that lacks one."""
+    pending = [sub_account for sub_account in sub_accounts if not (sub_account.get('total_due') or '').strip()]
+    if not pending:
+        return
+    # Flatten all line-item totals with the index of their sub-account, then parse
+    # and sum them per sub-account in one NumPy pass
+    group_ids = []
+    raw_totals = []
+    for index, sub_account in enumerate(pending):
+        for line_item in sub_account.get('line_items') or []:
+            total = line_item.get('total')
+            if total and total.strip():
+                group_ids.append(index)
+                raw_totals.append(total.translate(CURRENCY_STRIP))
+    totals = np.bincount(
+        np.array(group_ids, dtype=np.intp),
+        weights=np.array(raw_totals, dtype=np.float64),
+        minlength=len(pending)
+    )
+    for sub_account, total_due in zip(pending, totals):
+        sub_account['total_due'] = f"${total_due:.2f}"
+
+async def main():
     # Create necessary directories
     os.makedirs(os.path.join("data", "documents"), exist_ok=True)
     
@@ -145,41 +287,51 @@ def main():
     prompt_file = "telecom_prompt.txt"
     force_json = True
 
+    # Identical chunks get identical answers, so send each distinct chunk only once
+    chunk_digests = [hashlib.blake2b(chunk.page_content.encode("utf-8"), digest_size=16).digest() for chunk in chunks]
+    unique_contents = {}
+    for digest, chunk in zip(chunk_digests, chunks):
+        unique_contents.setdefault(digest, chunk.page_content)
+
+    # Chunks are independent, so fire all requests at once and bound them with a semaphore
+    logger.info(f"Dispatching {len(unique_contents)} unique chunks of {len(chunks)} to Azure OpenAI")
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    tasks = [get_llm_response_bounded(semaphore, content, force_json, prompt_file) for content in unique_contents.values()]
+    try:
+        unique_responses = await asyncio.gather(*tasks, return_exceptions=True)
+    finally:
+        # Release pooled connections before the event loop shuts down
+        await get_aoai_client().close()
+        get_aoai_client.cache_clear()
+    response_by_digest = dict(zip(unique_contents, unique_responses))
+    responses = [response_by_digest[digest] for digest in chunk_digests]
+
     master_account = {}
     sub_accounts = []
-    for i, chunk in enumerate(tqdm(chunks)):
+    for i, response in enumerate(tqdm(responses)):
         logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-        content = chunk.page_content
-        response = get_llm_response(content, force_json, prompt_file)
-        data = json.loads(response)
+        if isinstance(response, Exception):
+            logger.error(f"Chunk {i+1} failed: {str(response)}")
+            continue
+        try:
+            chunk_master, chunk_subs = parse_extraction(response)
+        except ValueError as e:
+            logger.error(f"Chunk {i+1} returned malformed output: {str(e)}")
+            continue
         # Take the first master_account with an account_number
-        if data.get("master_account", {}).get("account_number") and not master_account:
-            master_account = data["master_account"]
-        # Collect all sub-accounts
-        if "sub_accounts" in data:
-            sub_accounts.extend(data["sub_accounts"])
-
-    # Add total_due to each sub-account if not present
-    logger.info("Calculating total_due for sub-accounts where necessary")
-    for sub_account in sub_accounts:
-        if 'total_due' not in sub_account or not sub_account['total_due'].strip():
-            if 'line_items' in sub_account and sub_account['line_items']:
-                total_due = sum(
-                    float(line_item['total'].replace('$', '').replace(',', '')) 
-                    for line_item in sub_account['line_items'] 
-                    if line_item.get('total') and line_item['total'].strip()
-                )
-                sub_account['total_due'] = f"${total_due:.2f}"
-            else:
-                sub_account['total_due'] = "$0.00"
+        if chunk_master.get("account_number") and not master_account:
+            master_account = chunk_master
+        # Collect all sub-accounts, adding total_due where the chunk did not state one
+        fill_missing_totals(chunk_subs)
+        sub_accounts.extend(chunk_subs)
 
     output = {"master_account": master_account, "sub_accounts": sub_accounts}
 
     # Save output to JSON file
     output_file = os.path.join("data", "telecom_output.json")
     logger.info(f"Saving output to {output_file}")
-    with open(output_file, "w") as f:
-        json.dump(output, f, indent=2)
+    with open(output_file, "wb") as f:
+        f.write(orjson.dumps(output, option=orjson.OPT_INDENT_2))
 
     # Print a summary to the terminal
     logger.info("Processing complete. Output saved to telecom_output.json")
@@ -187,4 +339,4 @@ def main():
     print(f"Number of sub-accounts: {len(sub_accounts)}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    asyncio.run(main()) 
\ No newline at end of file
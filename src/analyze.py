@@ -7,16 +7,24 @@ Module for analyzing PDF documents using Azure Document Intelligence.
 
 import os
 import time
+import asyncio
 import logging
-from typing import Dict, Any, Optional, Tuple
+import hashlib
+import functools
+from urllib.parse import urlparse
+import orjson
+from typing import Dict, Any, List, Optional, Tuple, Union
 from azure.core.credentials import AzureKeyCredential
 from azure.ai.documentintelligence import DocumentIntelligenceClient
-from azure.ai.documentintelligence.models import DocumentAnalysisFeature, AnalyzeResult
+from azure.ai.documentintelligence.models import AnalyzeDocumentRequest, DocumentAnalysisFeature, AnalyzeResult
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# On-disk cache of analysis results keyed by PDF content hash and model
+ANALYSIS_CACHE_DIR = os.path.join("data", "cache")
+
 def extract_field_value(field) -> Any:
     """
     Extract the value from a DocumentField based on its type.
@@ -59,29 +67,36 @@ def extract_field_value(field) -> Any:
         logger.warning(f"Unknown field type '{field_type}' encountered")
         return field.content
 
-def analyze_document(
-    document_path: str,
-    model: str = "prebuilt-invoice",
-    di_endpoint: Optional[str] = None,
-    di_key: Optional[str] = None
-) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+def is_document_url(document_path: str) -> bool:
     """
-    Analyze a PDF document using Azure Document Intelligence with the specified model.
+    Check whether a document reference is an http(s) URL rather than a local path.
     
     Args:
-        document_path: Path to the PDF document.
-        model: Model to use ("prebuilt-invoice" or "prebuilt-layout"), defaults to "prebuilt-invoice".
-        di_endpoint: Azure Document Intelligence endpoint. If None, uses environment variable.
-        di_key: Azure Document Intelligence API key. If None, uses environment variable.
+        document_path: Local path or URL of the document.
         
     Returns:
-        Tuple of (raw_result: AnalyzeResult, parsed_result: Dict[str, Any]) containing raw API response and parsed data.
+        True if the document should be fetched by the service from its URL.
+    """
+    return urlparse(document_path).scheme in ("http", "https")
+
+def validate_document_file(document_path: str) -> None:
+    """
+    Check that a document exists, is a PDF, and is within the size limits.
+    
+    URLs are only checked for a PDF path, since the service fetches them directly.
+    
+    Args:
+        document_path: Path or URL of the PDF document.
         
     Raises:
         FileNotFoundError: If the document does not exist.
         ValueError: If the document is not a PDF, is empty, or exceeds size limit.
-        Exception: For other errors during analysis.
     """
+    if is_document_url(document_path):
+        if not urlparse(document_path).path.lower().endswith('.pdf'):
+            raise ValueError(f"Document must be a PDF file: {document_path}")
+        return
+    
     if not os.path.exists(document_path):
         raise FileNotFoundError(f"Document not found: {document_path}")
     
@@ -94,58 +109,283 @@ def analyze_document(
     if file_size > 50 * 1024 * 1024:  # 50 MB limit
         raise ValueError(f"Document exceeds 50MB limit: {file_size} bytes")
 
+def resolve_credentials(di_endpoint: Optional[str], di_key: Optional[str]) -> Tuple[str, str]:
+    """
+    Resolve the Document Intelligence endpoint and key, falling back to environment variables.
+    
+    Args:
+        di_endpoint: Azure Document Intelligence endpoint, or None.
+        di_key: Azure Document Intelligence API key, or None.
+        
+    Returns:
+        Tuple of (endpoint, key).
+        
+    Raises:
+        ValueError: If either value is missing.
+    """
     di_endpoint = di_endpoint or os.getenv("DOC_INTELLIGENCE_ENDPOINT")
     di_key = di_key or os.getenv("DOC_INTELLIGENCE_KEY")
     
     if not di_endpoint or not di_key:
         raise ValueError("Missing Azure Document Intelligence endpoint or key")
+    return di_endpoint, di_key
+
+@functools.lru_cache(maxsize=4)
+def get_di_client(di_endpoint: str, di_key: str) -> DocumentIntelligenceClient:
+    """
+    Return a shared Document Intelligence client for the given credentials.
+    
+    Reusing the client keeps its HTTP connection pool alive between documents.
+    
+    Args:
+        di_endpoint: Azure Document Intelligence endpoint.
+        di_key: Azure Document Intelligence API key.
+        
+    Returns:
+        DocumentIntelligenceClient instance.
+    """
+    return DocumentIntelligenceClient(
+        endpoint=di_endpoint,
+        credential=AzureKeyCredential(di_key)
+    )
+
+def parse_analyze_result(result: AnalyzeResult, model: str) -> Dict[str, Any]:
+    """
+    Convert a raw AnalyzeResult into the parsed dict used by the pipeline.
+    
+    Args:
+        result: Raw result returned by Azure Document Intelligence.
+        model: Model that produced the result.
+        
+    Returns:
+        Dict with 'content', 'fields' and 'styles'.
+    """
+    content = result.content
+    fields = {}
+    if model == "prebuilt-invoice" and result.documents and len(result.documents) > 0:
+        document = result.documents[0]
+        if document.fields:
+            for name, field in document.fields.items():
+                fields[name] = extract_field_value(field)
+    
+    # Downstream tagging only needs the spans of bold runs, so keep just those
+    styles = []
+    if model == "prebuilt-layout" and result.styles:
+        styles = [
+            {
+                "fontWeight": style.font_weight,
+                "spans": [{"offset": span.offset, "length": span.length} for span in (style.spans or [])]
+            }
+            for style in result.styles if style.font_weight == "bold"
+        ]
+    
+    return {
+        "content": content,
+        "fields": fields if model == "prebuilt-invoice" else {},
+        "styles": styles
+    }
+
+def analyze_document(
+    document_path: str,
+    model: str = "prebuilt-invoice",
+    di_endpoint: Optional[str] = None,
+    di_key: Optional[str] = None
+) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+    """
+    Analyze a PDF document using Azure Document Intelligence with the specified model.
+    
+    Args:
+        document_path: Path to the PDF document, or an http(s) URL the service can fetch.
+        model: Model to use ("prebuilt-invoice" or "prebuilt-layout"), defaults to "prebuilt-invoice".
+        di_endpoint: Azure Document Intelligence endpoint. If None, uses environment variable.
+        di_key: Azure Document Intelligence API key. If None, uses environment variable.
+        
+    Returns:
+        Tuple of (raw_result: AnalyzeResult, parsed_result: Dict[str, Any]) containing raw API response and parsed data.
+        
+    Raises:
+        FileNotFoundError: If the document does not exist.
+        ValueError: If the document is not a PDF, is empty, or exceeds size limit.
+        Exception: For other errors during analysis.
+    """
+    validate_document_file(document_path)
+    di_endpoint, di_key = resolve_credentials(di_endpoint, di_key)
 
     try:
         logger.info(f"Starting document analysis for {document_path} with model {model}")
         start_time = time.time()
         
-        client = DocumentIntelligenceClient(
-            endpoint=di_endpoint,
-            credential=AzureKeyCredential(di_key)
-        )
+        client = get_di_client(di_endpoint, di_key)
         
         features = [DocumentAnalysisFeature.STYLE_FONT] if model == "prebuilt-layout" else []
         
-        with open(document_path, "rb") as f:
+        if is_document_url(document_path):
+            # The service downloads the PDF itself, so nothing is uploaded from here
             poller = client.begin_analyze_document(
                 model,
-                f,
-                content_type="application/octet-stream",
+                AnalyzeDocumentRequest(url_source=document_path),
                 output_content_format="markdown",
                 features=features
             )
+        else:
+            # The open file is streamed as the request body rather than read into memory
+            with open(document_path, "rb") as f:
+                poller = client.begin_analyze_document(
+                    model,
+                    f,
+                    content_type="application/octet-stream",
+                    output_content_format="markdown",
+                    features=features
+                )
         
         result = poller.result()
-        
-        # Parsed result
-        content = result.content
-        fields = {}
-        if model == "prebuilt-invoice" and result.documents and len(result.documents) > 0:
-            document = result.documents[0]
-            if document.fields:
-                for name, field in document.fields.items():
-                    fields[name] = extract_field_value(field)
+        parsed_result = parse_analyze_result(result, model)
         
         end_time = time.time()
         logger.info(f"Document analysis with {model} completed in {end_time - start_time:.2f} seconds")
         
-        parsed_result = {
-            "content": content,
-            "fields": fields if model == "prebuilt-invoice" else {},
-            "styles": [style.__dict__ for style in result.styles] if model == "prebuilt-layout" and result.styles else []
-        }
-        
         return result, parsed_result
     
     except Exception as e:
         logger.error(f"Error analyzing document: {str(e)}")
         raise
 
+def file_sha256(document_path: str) -> str:
+    """
+    Compute the SHA-256 hex digest of a file without loading it all into memory.
+    
+    Args:
+        document_path: Path to the file.
+        
+    Returns:
+        Hex digest string.
+    """
+    digest = hashlib.sha256()
+    with open(document_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def analyze_document_cached(
+    document_path: str,
+    model: str = "prebuilt-invoice",
+    di_endpoint: Optional[str] = None,
+    di_key: Optional[str] = None,
+    cache_dir: str = ANALYSIS_CACHE_DIR
+) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+    """
+    Analyze a PDF document, reusing a previous result for the same file content and model.
+    
+    Results are cached on disk under cache_dir as {sha256}.{model}.json, so
+    re-processing an unchanged PDF skips the Document Intelligence call. URLs
+    are never cached.
+    
+    Args:
+        document_path: Path to the PDF document, or an http(s) URL the service can fetch.
+        model: Model to use ("prebuilt-invoice" or "prebuilt-layout"), defaults to "prebuilt-invoice".
+        di_endpoint: Azure Document Intelligence endpoint. If None, uses environment variable.
+        di_key: Azure Document Intelligence API key. If None, uses environment variable.
+        cache_dir: Directory holding cached analysis results.
+        
+    Returns:
+        Tuple of (raw_result: AnalyzeResult, parsed_result: Dict[str, Any]), same as analyze_document.
+        
+    Raises:
+        FileNotFoundError: If the document does not exist.
+        ValueError: If the document is not a PDF, is empty, or exceeds size limit.
+        Exception: For other errors during analysis.
+    """
+    if is_document_url(document_path):
+        return analyze_document(document_path, model, di_endpoint, di_key)
+    
+    validate_document_file(document_path)
+    cache_path = os.path.join(cache_dir, f"{file_sha256(document_path)}.{model}.json")
+    
+    try:
+        with open(cache_path, "rb") as f:
+            result = AnalyzeResult(orjson.loads(f.read()))
+        logger.info(f"Using cached {model} analysis for {document_path}")
+        return result, parse_analyze_result(result, model)
+    except FileNotFoundError:
+        pass
+    except ValueError as e:
+        logger.warning(f"Ignoring unreadable analysis cache entry {cache_path}: {str(e)}")
+    
+    result, parsed_result = analyze_document(document_path, model, di_endpoint, di_key)
+    
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(orjson.dumps(result.as_dict(), default=str))
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write analysis cache entry {cache_path}: {str(e)}")
+    
+    return result, parsed_result
+
+async def analyze_document_async(
+    document_path: str,
+    model: str = "prebuilt-invoice",
+    di_endpoint: Optional[str] = None,
+    di_key: Optional[str] = None
+) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+    """
+    Analyze a PDF document without blocking the event loop.
+    
+    The blocking analyze_document call runs in a worker thread, sharing the
+    cached synchronous client and its connection pool.
+    
+    Args:
+        document_path: Path to the PDF document, or an http(s) URL the service can fetch.
+        model: Model to use ("prebuilt-invoice" or "prebuilt-layout"), defaults to "prebuilt-invoice".
+        di_endpoint: Azure Document Intelligence endpoint. If None, uses environment variable.
+        di_key: Azure Document Intelligence API key. If None, uses environment variable.
+        
+    Returns:
+        Tuple of (raw_result: AnalyzeResult, parsed_result: Dict[str, Any]), same as analyze_document.
+        
+    Raises:
+        FileNotFoundError: If the document does not exist.
+        ValueError: If the document is not a PDF, is empty, or exceeds size limit.
+        Exception: For other errors during analysis.
+    """
+    return await asyncio.to_thread(analyze_document, document_path, model, di_endpoint, di_key)
+
+async def analyze_many(
+    document_paths: List[str],
+    model: str = "prebuilt-invoice",
+    concurrency: int = 10,
+    di_endpoint: Optional[str] = None,
+    di_key: Optional[str] = None
+) -> List[Union[Tuple[AnalyzeResult, Dict[str, Any]], Exception]]:
+    """
+    Analyze several PDF documents concurrently with one shared client.
+    
+    Args:
+        document_paths: Paths to the PDF documents.
+        model: Model to use for every document, defaults to "prebuilt-invoice".
+        concurrency: Maximum number of analyze jobs in flight at once, defaults to 10.
+        di_endpoint: Azure Document Intelligence endpoint. If None, uses environment variable.
+        di_key: Azure Document Intelligence API key. If None, uses environment variable.
+        
+    Returns:
+        One entry per input path, in the same order: the (raw_result, parsed_result)
+        tuple on success, or the exception raised for that document.
+        
+    Raises:
+        ValueError: If the endpoint or key is missing.
+    """
+    di_endpoint, di_key = resolve_credentials(di_endpoint, di_key)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def analyze_one(document_path: str) -> Tuple[AnalyzeResult, Dict[str, Any]]:
+        async with semaphore:
+            return await analyze_document_async(document_path, model, di_endpoint, di_key)
+
+    logger.info(f"Analyzing {len(document_paths)} documents with model {model} (concurrency {concurrency})")
+    return await asyncio.gather(*[analyze_one(path) for path in document_paths], return_exceptions=True)
+
 if __name__ == "__main__":
     from dotenv import load_dotenv
     load_dotenv()
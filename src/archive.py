@@ -6,15 +6,89 @@ Module for archiving bills and extracted data.
 """
 
 import os
-import json
+import errno
 import shutil
 import logging
+import orjson
 from typing import Dict, Any, Optional
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+def save_extracted_data(
+    document_path: str,
+    data: Dict[str, Any],
+    output_dir: str = "data/output"
+) -> str:
+    """
+    Save the extracted data for a bill to the output directory.
+    
+    This does not depend on the validation result, so callers may run it
+    while validation is still in progress.
+    
+    Args:
+        document_path: Path to the original PDF document.
+        data: The extracted bill data.
+        output_dir: Directory for extracted JSON data.
+        
+    Returns:
+        Path to the written JSON file.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    document_base_name = os.path.splitext(os.path.basename(document_path))[0]
+    output_json_path = os.path.join(output_dir, f"{document_base_name}_output.json")
+    
+    # orjson encodes the date values Document Intelligence returns in the same
+    # single pass, and anything else it does not know (e.g. Decimal) falls
+    # back to str(). Written to a temporary file first so a failed write never
+    # leaves a truncated JSON file behind
+    tmp_path = f"{output_json_path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(orjson.dumps(data, default=str, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, output_json_path)
+    logger.info(f"Extracted data saved to {output_json_path}")
+    return output_json_path
+
+def move_document(
+    document_path: str,
+    is_valid: bool,
+    archive_dir: str = "data/archive",
+    audit_dir: str = "data/audit"
+) -> str:
+    """
+    Move a bill into the archive or audit directory.
+    
+    Args:
+        document_path: Path to the original PDF document.
+        is_valid: Whether the bill passed validation.
+        archive_dir: Directory for successfully processed bills.
+        audit_dir: Directory for bills failing validation.
+        
+    Returns:
+        Path to the moved document.
+        
+    Raises:
+        FileNotFoundError: If the document does not exist.
+    """
+    if not os.path.exists(document_path):
+        raise FileNotFoundError(f"Document not found: {document_path}")
+    
+    target_dir = archive_dir if is_valid else audit_dir
+    os.makedirs(target_dir, exist_ok=True)
+    target_document_path = os.path.join(target_dir, os.path.basename(document_path))
+    
+    # A rename on the same filesystem, copy-and-delete only when crossing
+    # filesystems
+    try:
+        os.replace(document_path, target_document_path)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(document_path, target_document_path)
+    logger.info(f"Document moved to {target_document_path}")
+    return target_document_path
+
 def archive_bill(
     document_path: str,
     data: Dict[str, Any],
@@ -50,36 +124,13 @@ def archive_bill(
         if not os.path.exists(document_path):
             raise FileNotFoundError(f"Document not found: {document_path}")
         
-        # Create directories if they don't exist
-        os.makedirs(archive_dir, exist_ok=True)
-        os.makedirs(audit_dir, exist_ok=True)
-        os.makedirs(output_dir, exist_ok=True)
-        
-        # Get the document filename
-        document_name = os.path.basename(document_path)
-        document_base_name = os.path.splitext(document_name)[0]
-        
-        # Determine target directory based on validation result
-        is_valid = validation_result.get('valid', False)
-        target_dir = archive_dir if is_valid else audit_dir
-        
-        # Create target paths
-        target_document_path = os.path.join(target_dir, document_name)
-        output_json_path = os.path.join(output_dir, f"{document_base_name}_output.json")
-        
-        # Copy the document to the target directory
-        shutil.copy2(document_path, target_document_path)
-        logger.info(f"Document copied to {target_document_path}")
-        
-        # Save the extracted data to the output directory
-        with open(output_json_path, 'w') as f:
-            json.dump(data, f, indent=2)
-        logger.info(f"Extracted data saved to {output_json_path}")
-        
-        # Remove the original document if successfully archived
-        if os.path.exists(target_document_path):
-            os.remove(document_path)
-            logger.info(f"Original document removed: {document_path}")
+        output_json_path = save_extracted_data(document_path, data, output_dir)
+        target_document_path = move_document(
+            document_path,
+            validation_result.get('valid', False),
+            archive_dir,
+            audit_dir
+        )
         
         return {
             'document': target_document_path,
@@ -7,9 +7,11 @@ Module for determining bill type (SLB or MLB) based on account number using a li
 
 import logging
 import re
+import time
+import functools
 from typing import Dict, Any, Optional
-import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, pooling
+from mysql.connector.errors import PoolError
 from dotenv import load_dotenv
 import os
 
@@ -19,6 +21,19 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 
+# Precompiled patterns for account number extraction and cleanup
+ACCOUNT_NUMBER_RE = re.compile(r'Account\s*(?:#|Number|No\.?)\s*[:\s]?\s*([a-zA-Z0-9\s\-]+)', re.IGNORECASE)
+NON_ALPHANUMERIC_RE = re.compile(r'[^a-zA-Z0-9]')
+
+# MySQL Connector/Python refuses pools larger than this
+MAX_POOL_SIZE = 32
+
+# How long to keep retrying when every pooled connection is borrowed; the pool
+# raises instead of blocking, so a batch running more documents than the pool
+# has connections waits here for one to be returned
+POOL_WAIT_SECONDS = 30.0
+POOL_RETRY_DELAY = 0.05
+
 def clean_account_number(account_number: str) -> str:
     """
     Clean the account number by removing non-alphanumeric characters.
@@ -29,40 +44,131 @@ def clean_account_number(account_number: str) -> str:
     Returns:
         Cleaned account number.
     """
-    return re.sub(r'[^a-zA-Z0-9]', '', account_number)
+    return NON_ALPHANUMERIC_RE.sub('', account_number)
 
-def get_db_connection():
+@functools.lru_cache(maxsize=1)
+def get_db_pool() -> pooling.MySQLConnectionPool:
     """
-    Establish a connection to the production database.
+    Create the shared connection pool for the production database on first use.
     
     Returns:
-        MySQL connection object.
+        MySQL connection pool.
         
     Raises:
-        Error: If connection fails.
+        Error: If the pool cannot be created.
     """
     try:
-        connection = mysql.connector.connect(
+        pool = pooling.MySQLConnectionPool(
+            pool_name="billtype",
+            pool_size=min(int(os.getenv("DB_POOL_SIZE", "8")), MAX_POOL_SIZE),
             host=os.getenv("DB_HOST", "cissdm.cis.local"),
             database=os.getenv("DB_NAME", "tem"),
             user=os.getenv("DB_USER", "view"),
             password=os.getenv("DB_PASS", "Eastw00d")
         )
-        if connection.is_connected():
-            logger.info("Successfully connected to the database")
-            return connection
+        logger.info("Database connection pool created")
+        return pool
+    except Error as e:
+        logger.error(f"Error creating database connection pool: {str(e)}")
+        raise
+
+def get_db_connection():
+    """
+    Get a connection to the production database from the shared pool.
+    
+    Closing the returned connection hands it back to the pool. When all pooled
+    connections are in use, retries with back-off for up to POOL_WAIT_SECONDS.
+    
+    Returns:
+        MySQL connection object.
+        
+    Raises:
+        PoolError: If no connection is returned to the pool in time.
+        Error: If connection fails or the pooled connection is not connected.
+    """
+    try:
+        pool = get_db_pool()
+        deadline = time.monotonic() + POOL_WAIT_SECONDS
+        delay = POOL_RETRY_DELAY
+        while True:
+            try:
+                connection = pool.get_connection()
+                break
+            except PoolError:
+                if time.monotonic() + delay > deadline:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+        if not connection.is_connected():
+            # Hand the slot back to the pool rather than leaking it; close() returns
+            # the connection even if resetting its session fails
+            try:
+                connection.close()
+            except Error:
+                pass
+            raise Error(msg="Pooled database connection is not connected")
+        logger.info("Successfully connected to the database")
+        return connection
     except Error as e:
         logger.error(f"Error connecting to database: {str(e)}")
         raise
 
+@functools.lru_cache(maxsize=4096)
+def lookup_bill_type(cleaned_account_number: str) -> Dict[str, str]:
+    """
+    Look up the bill type for a cleaned account number in the production database.
+    
+    Results are memoized per account number, so repeat bills for the same
+    account in a batch run skip the database round-trip.
+    
+    Args:
+        cleaned_account_number: Account number with non-alphanumeric characters removed.
+        
+    Returns:
+        Dict with 'bill_type' (SLB or MLB) and 'status' (ok or audit). Treat as read-only.
+        
+    Raises:
+        Error: For database connection or query errors; failures are not memoized.
+    """
+    # Borrow a pooled connection; closing it returns it to the pool
+    connection = get_db_connection()
+    try:
+        cursor = connection.cursor(dictionary=True)
+        
+        # Query temMasterViewUpdated
+        query = "SELECT multipleLocations FROM temMasterViewUpdated WHERE accountNumber = %s"
+        cursor.execute(query, (cleaned_account_number,))
+        result = cursor.fetchone()
+        cursor.close()
+    finally:
+        connection.close()
+    
+    if result:
+        logger.info(f"Database record found for account {cleaned_account_number}")
+        multiple_locations = result['multipleLocations']
+        bill_type = 'MLB' if multiple_locations == 1 else 'SLB'
+        logger.info(f"Bill type determined: {bill_type} based on multipleLocations: {multiple_locations}")
+        return {
+            'bill_type': bill_type,
+            'status': 'ok'
+        }
+    else:
+        logger.warning(f"Account number {cleaned_account_number} not found in database, flagging for audit")
+        return {
+            'bill_type': None,
+            'status': 'audit'
+        }
+
 def determine_bill_type(
-    analysis_result: Dict[str, Any]
+    analysis_result: Dict[str, Any],
+    fields: Optional[Dict[str, Any]] = None
 ) -> Dict[str, str]:
     """
     Determine the bill type (SLB or MLB) based on the account number via live database lookup.
     
     Args:
         analysis_result: The result from document analysis containing 'fields' and 'content'.
+        fields: The analysis result's 'fields', when the caller has already extracted them.
         
     Returns:
         Dict with 'bill_type' (SLB or MLB) and 'status' (ok or audit).
@@ -78,7 +184,8 @@ def determine_bill_type(
         account_number = None
         
         # Try fields first (CustomerId or InvoiceId might be used as account number)
-        fields = analysis_result.get('fields', {})
+        if fields is None:
+            fields = analysis_result.get('fields', {})
         if 'CustomerId' in fields:
             account_number = fields['CustomerId']
         elif 'InvoiceId' in fields:
@@ -87,7 +194,7 @@ def determine_bill_type(
         # Fallback to content if not in fields
         if not account_number:
             content = analysis_result.get('content', '')
-            account_match = re.search(r'Account\s*(?:#|Number|No\.?)\s*[:\s]?\s*([a-zA-Z0-9\s\-]+)', content, re.IGNORECASE)
+            account_match = ACCOUNT_NUMBER_RE.search(content)
             if account_match:
                 account_number = account_match.group(1).strip()
         
@@ -102,34 +209,8 @@ def determine_bill_type(
         cleaned_account_number = clean_account_number(str(account_number))
         logger.info(f"Found account number: {cleaned_account_number}")
         
-        # Connect to the database
-        connection = get_db_connection()
-        cursor = connection.cursor(dictionary=True)
-        
-        # Query temMasterViewUpdated
-        query = "SELECT multipleLocations FROM temMasterViewUpdated WHERE accountNumber = %s"
-        cursor.execute(query, (cleaned_account_number,))
-        result = cursor.fetchone()
-        
-        # Close the connection
-        cursor.close()
-        connection.close()
-        
-        if result:
-            logger.info(f"Database record found for account {cleaned_account_number}")
-            multiple_locations = result['multipleLocations']
-            bill_type = 'MLB' if multiple_locations == 1 else 'SLB'
-            logger.info(f"Bill type determined: {bill_type} based on multipleLocations: {multiple_locations}")
-            return {
-                'bill_type': bill_type,
-                'status': 'ok'
-            }
-        else:
-            logger.warning(f"Account number {cleaned_account_number} not found in database, flagging for audit")
-            return {
-                'bill_type': None,
-                'status': 'audit'
-            }
+        # Copy so callers cannot alter the memoized result
+        return dict(lookup_bill_type(cleaned_account_number))
     
     except Error as e:
         logger.error(f"Database error: {str(e)}")
@@ -5,25 +5,33 @@
 Main module for orchestrating the bill processing pipeline with detailed API response debugging.
 """
 
+from __future__ import annotations
+
 import os
 import sys
-import json
+import asyncio
+import argparse
 import logging
-from typing import Dict, Any, List, Optional
+import orjson
+from typing import TYPE_CHECKING, Dict, Any, List, Optional
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import datetime
+
+if TYPE_CHECKING:
+    from openai import AsyncAzureOpenAI
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# Import modules
-from src.analyze import analyze_document
-from src.bill_type import determine_bill_type
-from src.process_slb import process_slb
-from src.process_mlb import process_mlb
-from src.validate import validate_data, perform_basic_validation
-from src.archive import archive_bill
+# Background writer for debug JSON dumps; its threads are joined at interpreter exit,
+# so queued dumps are flushed before the process ends
+IO_POOL = ThreadPoolExecutor(max_workers=2, thread_name_prefix="json-writer")
+
+# Directory for the raw and extracted JSON dumps; created once here rather than
+# on every document
+OUTPUT_DIR = "data/output"
+os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 def list_documents(documents_dir: str = "data/documents") -> List[str]:
     """
@@ -37,148 +45,216 @@ def list_documents(documents_dir: str = "data/documents") -> List[str]:
     """
     if not os.path.exists(documents_dir):
         os.makedirs(documents_dir, exist_ok=True)
-        logger.info(f"Created documents directory: {documents_dir}")
+        logger.info("Created documents directory: %s", documents_dir)
         return []
     
-    documents = [os.path.join(documents_dir, file) for file in os.listdir(documents_dir) if file.lower().endswith('.pdf')]
-    return documents
+    # DirEntry carries the name and path already, and is_file() uses the cached d_type
+    with os.scandir(documents_dir) as entries:
+        return [
+            entry.path for entry in entries
+            if entry.name.lower().endswith('.pdf') and entry.is_file(follow_symlinks=False)
+        ]
 
-def serialize_dates(obj):
+def json_default(obj: Any) -> Any:
     """
-    Serialize date, datetime objects, and custom Azure objects to JSON-serializable formats.
+    Convert objects orjson cannot encode natively, such as Azure SDK models.
+    
+    Dates, datetimes, dicts and lists are handled by orjson itself, so the
+    encoder walks the payload once instead of after a separate Python pass.
     
     Args:
-        obj: The object to serialize (dict, list, date, etc.).
+        obj: The object the encoder could not serialize.
         
     Returns:
-        A JSON-serializable version of the object.
+        A JSON-serializable replacement for the object.
     """
-    if isinstance(obj, dict):
-        return {k: serialize_dates(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [serialize_dates(item) for item in obj]
-    elif isinstance(obj, (datetime.date, datetime.datetime)):
-        return obj.isoformat()
-    elif hasattr(obj, '__dict__'):
-        return serialize_dates(obj.__dict__)
-    elif hasattr(obj, 'as_dict') and callable(getattr(obj, 'as_dict')):
-        return serialize_dates(obj.as_dict())
-    else:
-        try:
-            json.dumps(obj)
-            return obj
-        except (TypeError, OverflowError):
-            return str(obj)
+    if hasattr(obj, 'as_dict') and callable(getattr(obj, 'as_dict')):
+        return obj.as_dict()
+    if hasattr(obj, '__dict__'):
+        return obj.__dict__
+    return str(obj)
+
+def write_ndjson(path: str, records: List[Any]) -> None:
+    """
+    Write records to a file as newline-delimited JSON, one record per line.
+    
+    Args:
+        path: Destination file path.
+        records: Records to write; values orjson cannot encode go through json_default.
+    """
+    with open(path, 'wb') as f:
+        f.write(b"".join(orjson.dumps(record, default=json_default) + b"\n" for record in records))
+
+def write_ndjson_in_background(path: str, records: List[Any]) -> None:
+    """
+    Queue an NDJSON dump on the background writer so the pipeline does not wait on disk.
+    
+    The records must not be modified after they are queued. Write failures are logged.
+    
+    Args:
+        path: Destination file path.
+        records: Records to write.
+    """
+    def log_failure(future):
+        if future.exception() is not None:
+            logger.error("Error writing %s: %s", path, future.exception())
+    IO_POOL.submit(write_ndjson, path, records).add_done_callback(log_failure)
 
 def print_extracted_fields(analysis_result):
     """Print extracted fields from document analysis."""
-    print("\n=== Extracted Fields from Document Analysis ===")
+    # Collect the report and write it in one call instead of one print per line
+    parts = []
+    parts.append("\n=== Extracted Fields from Document Analysis ===\n")
     fields = analysis_result.get('fields', {})
     for key, value in fields.items():
         if isinstance(value, dict):
-            print(f"{key}:")
+            parts.append(f"{key}:\n")
             for sub_key, sub_value in value.items():
-                print(f"  {sub_key}: {sub_value}")
+                parts.append(f"  {sub_key}: {sub_value}\n")
         elif isinstance(value, list):
-            print(f"{key}:")
+            parts.append(f"{key}:\n")
             for i, item in enumerate(value):
                 if isinstance(item, dict):
-                    print(f"  Item {i+1}:")
+                    parts.append(f"  Item {i+1}:\n")
                     for sub_key, sub_value in item.items():
-                        print(f"    {sub_key}: {sub_value}")
+                        parts.append(f"    {sub_key}: {sub_value}\n")
                 else:
-                    print(f"  Item {i+1}: {item}")
+                    parts.append(f"  Item {i+1}: {item}\n")
         else:
-            print(f"{key}: {value}")
-    print("=" * 50)
+            parts.append(f"{key}: {value}\n")
+    parts.append("=" * 50 + "\n")
+    sys.stdout.write("".join(parts))
 
 def print_slb_data(extracted_data):
     """Print extracted SLB data."""
-    print("\n=== Extracted SLB Data ===")
+    parts = []
+    parts.append("\n=== Extracted SLB Data ===\n")
     account = extracted_data.get('account', {})
     line_items = extracted_data.get('line_items', [])
-    print("Account Information:")
+    parts.append("Account Information:\n")
     for key, value in account.items():
-        print(f"  {key}: {value}")
-    print("\nLine Items:")
+        parts.append(f"  {key}: {value}\n")
+    parts.append("\nLine Items:\n")
     for i, item in enumerate(line_items):
-        print(f"  Item {i+1}:")
+        parts.append(f"  Item {i+1}:\n")
         for key, value in item.items():
-            print(f"    {key}: {value}")
-    print("=" * 50)
+            parts.append(f"    {key}: {value}\n")
+    parts.append("=" * 50 + "\n")
+    sys.stdout.write("".join(parts))
 
 def print_mlb_data(extracted_data):
     """Print extracted MLB data."""
-    print("\n=== Extracted MLB Data ===")
+    parts = []
+    parts.append("\n=== Extracted MLB Data ===\n")
     master_account = extracted_data.get('master_account', {})
     sub_accounts = extracted_data.get('sub_accounts', [])
-    print("Master Account Information:")
+    parts.append("Master Account Information:\n")
     for key, value in master_account.items():
-        print(f"  {key}: {value}")
-    print(f"\nSub-Accounts ({len(sub_accounts)}):")
+        parts.append(f"  {key}: {value}\n")
+    parts.append(f"\nSub-Accounts ({len(sub_accounts)}):\n")
     for i, account in enumerate(sub_accounts):
-        print(f"\n  Sub-Account {i+1}:")
+        parts.append(f"\n  Sub-Account {i+1}:\n")
         for key, value in account.items():
             if key != 'line_items':
-                print(f"    {key}: {value}")
+                parts.append(f"    {key}: {value}\n")
         line_items = account.get('line_items', [])
         if line_items:
-            print(f"    Line Items ({len(line_items)}):")
+            parts.append(f"    Line Items ({len(line_items)}):\n")
             for j, item in enumerate(line_items):
-                print(f"      Item {j+1}:")
+                parts.append(f"      Item {j+1}:\n")
                 for key, value in item.items():
-                    print(f"        {key}: {value}")
-    print("=" * 50)
+                    parts.append(f"        {key}: {value}\n")
+    parts.append("=" * 50 + "\n")
+    sys.stdout.write("".join(parts))
 
-def process_document(document_path: str) -> Dict[str, Any]:
+async def process_document_async(
+    document_path: str,
+    openai_client: Optional[AsyncAzureOpenAI] = None
+) -> Dict[str, Any]:
     """
-    Process a single document through the pipeline.
+    Process a single document through the pipeline without blocking the event loop.
+    
+    Blocking SDK and database calls run in worker threads.
     
     Args:
         document_path: Path to the document.
+        openai_client: Async Azure OpenAI client shared by the batch, or None to open one per MLB.
         
     Returns:
         Dict with processing results.
     """
-    logger.info(f"Processing document: {document_path}")
+    logger.info("Processing document: %s", document_path)
     document_name = os.path.basename(document_path)
-    output_dir = "data/output"
-    os.makedirs(output_dir, exist_ok=True)
+
+    # Every stage's raw result goes to one {document_name}.ndjson file, written
+    # once the pipeline finishes or fails, instead of a file per stage
+    stages = []
+    try:
+        return await run_pipeline(document_path, document_name, stages, openai_client)
+    finally:
+        if stages:
+            write_ndjson_in_background(os.path.join(OUTPUT_DIR, f"{document_name}.ndjson"), stages)
+
+async def run_pipeline(
+    document_path: str,
+    document_name: str,
+    stages: List[Dict[str, Any]],
+    openai_client: Optional[AsyncAzureOpenAI] = None
+) -> Dict[str, Any]:
+    """
+    Run the pipeline steps for one document.
+    
+    Args:
+        document_path: Path to the document.
+        document_name: File name of the document.
+        stages: List the raw result of each step is appended to as {'stage': ..., 'data': ...}.
+        openai_client: Async Azure OpenAI client shared by the batch, or None to open one per MLB.
+        
+    Returns:
+        Dict with processing results.
+    """
+    # Pipeline modules pull in the Azure, OpenAI and MySQL SDKs, so they are only
+    # imported here, once a document is actually processed, keeping CLI startup fast
+    from src.analyze import analyze_document_cached
+    from src.bill_type import determine_bill_type
+    from src.process_slb import process_slb
+    from src.process_mlb import process_mlb_async
+    from src.validate import validate_data
+    from src.archive import archive_bill, save_extracted_data, move_document
 
     # Step 1: Initial analysis with prebuilt-invoice
-    print("\nStep 1: Analyzing document with prebuilt-invoice")
-    raw_result_invoice, analysis_result_invoice = analyze_document(document_path, model="prebuilt-invoice")
-    print("Step 1: Completed")
-    print_extracted_fields(analysis_result_invoice)
+    logger.info("Step 1: Analyzing document with prebuilt-invoice")
+    raw_result_invoice, analysis_result_invoice = await asyncio.to_thread(analyze_document_cached, document_path, model="prebuilt-invoice")
+    logger.info("Step 1: Completed")
+    if logger.isEnabledFor(logging.DEBUG):
+        print_extracted_fields(analysis_result_invoice)
+    else:
+        logger.info("Invoice analysis: %d fields", len(analysis_result_invoice.get('fields', {})))
     
-    analysis_raw_file = os.path.join(output_dir, f"{document_name}_analysis_invoice_raw.json")
-    with open(analysis_raw_file, 'w') as f:
-        json.dump(serialize_dates(analysis_result_invoice), f, indent=2)
-    print(f"Step 1 Raw API Response: Written to {analysis_raw_file}")
+    stages.append({'stage': 'analysis_invoice_raw', 'data': analysis_result_invoice})
 
     # Extract master account data from analysis_result_invoice
     fields = analysis_result_invoice.get('fields', {})
     master_account = {
         'account_number': fields.get('CustomerId'),
-        'total_due': str(fields.get('AmountDue')),  # Assuming AmountDue is numeric, convert to string for consistency
+        'total_due': fields.get('AmountDue'),  # Currency amount as a float, or None when the invoice has none
         'due_date': fields.get('DueDate'),
         'vendor_name': fields.get('VendorName'),
         # Add other fields as needed
     }
 
     # Step 2: Determine bill type
-    print("\nStep 2: Determining bill type")
-    bill_type_result = determine_bill_type(analysis_result_invoice)
+    logger.info("Step 2: Determining bill type")
+    bill_type_result = await asyncio.to_thread(determine_bill_type, analysis_result_invoice, fields)
     bill_type, status = bill_type_result['bill_type'], bill_type_result['status']
-    print(f"Step 2: Completed - Bill Type: {bill_type}, Status: {status}")
-    print(f"Step 2 Result: {json.dumps(bill_type_result, indent=2)}")
+    logger.info("Step 2: Completed - Bill Type: %s, Status: %s", bill_type, status)
 
     if status == "audit":
-        print("Step 2: Flagged for audit")
+        logger.info("Step 2: Flagged for audit")
         validation_result = {"valid": False, "errors": [{"field": "bill_type", "error": "Unknown account number"}]}
-        archive_result = archive_bill(document_path, {"error": "Unknown account number"}, validation_result, None)
-        print(f"Step 5: Archiving bill - Completed (Audit)")
-        print(f"Step 5 Result: Archived to {archive_result['document']}, Data saved to {archive_result['data']}")
+        archive_result = await asyncio.to_thread(archive_bill, document_path, {"error": "Unknown account number"}, validation_result, None)
+        logger.info("Step 5: Archiving bill - Completed (Audit)")
+        logger.info("Step 5 Result: Archived to %s, Data saved to %s", archive_result['document'], archive_result['data'])
         return {
             'document_path': document_path,
             'bill_type': None,
@@ -188,61 +264,64 @@ def process_document(document_path: str) -> Dict[str, Any]:
         }
 
     # Step 3: Process bill
-    print(f"\nStep 3: Processing {bill_type} bill")
+    logger.info("Step 3: Processing %s bill", bill_type)
     if bill_type == "SLB":
-        extracted_data = process_slb(analysis_result_invoice)
-        print("Step 3: Completed")
-        print_slb_data(extracted_data)
-        extracted_file = os.path.join(output_dir, f"{document_name}_extracted_raw.json")
-        with open(extracted_file, 'w') as f:
-            json.dump(serialize_dates(extracted_data), f, indent=2)
-        print(f"Step 3 Raw API Response: Written to {extracted_file}")
+        extracted_data = await asyncio.to_thread(process_slb, analysis_result_invoice)
+        logger.info("Step 3: Completed")
+        if logger.isEnabledFor(logging.DEBUG):
+            print_slb_data(extracted_data)
+        else:
+            logger.info("SLB: %d line items", len(extracted_data.get('line_items', [])))
+        stages.append({'stage': 'extracted_raw', 'data': extracted_data})
     else:  # MLB
-        # Second analysis with prebuilt-layout for MLB
-        print("\nStep 3: Analyzing document with prebuilt-layout for MLB")
-        raw_result_layout, analysis_result_layout = analyze_document(document_path, model="prebuilt-layout")
-        print("Step 3: Completed layout analysis")
-        extracted_data = process_mlb(
+        # Second analysis with prebuilt-layout, only once the bill is known to be an MLB,
+        # so SLB and audit bills never pay for it
+        logger.info("Step 3: Analyzing document with prebuilt-layout for MLB")
+        raw_result_layout, analysis_result_layout = await asyncio.to_thread(analyze_document_cached, document_path, model="prebuilt-layout")
+        logger.info("Step 3: Completed layout analysis")
+        extracted_data = await process_mlb_async(
             analysis_result_layout,
             master_account,
             document_name,
-            prompt_file="telecom_prompt.txt"
+            prompt_file="telecom_prompt.txt",
+            client=openai_client
         )
-        print("Step 3: Completed MLB processing")
-        print_mlb_data(extracted_data)
-        extracted_file = os.path.join(output_dir, f"{document_name}_extracted.json")
-        with open(extracted_file, 'w') as f:
-            json.dump(serialize_dates(extracted_data), f, indent=2)
-        print(f"Step 3 Parsed Result: Written to {extracted_file}")
-
-    # Step 4: Validate data
-    print("\nStep 4: Validating extracted data")
-    basic_validation = perform_basic_validation(extracted_data, bill_type)
-    validation_result = validate_data(extracted_data, bill_type)
-    print(f"Step 4: Completed - Validation: {'Valid' if validation_result['valid'] else 'Invalid'}")
-    print("\n=== Validation Results ===")
-    print(f"Valid: {validation_result['valid']}")
-    if not validation_result['valid'] and 'errors' in validation_result:
-        print("\nErrors:")
-        for error in validation_result['errors']:
-            print(f"  Field: {error.get('field', 'Unknown')}")
-            print(f"  Error: {error.get('error', 'Unknown error')}")
-    if 'warnings' in validation_result and validation_result['warnings']:
-        print("\nWarnings:")
-        for warning in validation_result['warnings']:
-            print(f"  Field: {warning.get('field', 'Unknown')}")
-            print(f"  Warning: {warning.get('warning', 'Unknown warning')}")
-    print("=" * 50)
-    validation_raw_file = os.path.join(output_dir, f"{document_name}_validation_raw.json")
-    with open(validation_raw_file, 'w') as f:
-        json.dump(serialize_dates(validation_result), f, indent=2)
-    print(f"Step 4 Raw API Response: Written to {validation_raw_file}")
-
-    # Step 5: Archive bill
-    print("\nStep 5: Archiving bill")
-    archive_result = archive_bill(document_path, extracted_data, validation_result, bill_type)
-    print("Step 5: Completed")
-    print(f"Step 5 Result: Archived to {archive_result['document']}, Data saved to {archive_result['data']}")
+        logger.info("Step 3: Completed MLB processing")
+        if logger.isEnabledFor(logging.DEBUG):
+            print_mlb_data(extracted_data)
+        else:
+            sub_accounts = extracted_data.get('sub_accounts', [])
+            logger.info("MLB: %d sub-accounts, %d line items",
+                        len(sub_accounts), sum(len(account.get('line_items', [])) for account in sub_accounts))
+        stages.append({'stage': 'extracted', 'data': extracted_data})
+
+    # The extracted-data archive does not depend on validation, so write it
+    # while validation runs; only the document move has to wait
+    archive_data_task = asyncio.create_task(asyncio.to_thread(save_extracted_data, document_path, extracted_data))
+
+    # Always wait for the extracted-data write, even if validation or the move
+    # fails, so the task is never left unobserved or its file half-written
+    try:
+        # Step 4: Validate data
+        logger.info("Step 4: Validating extracted data")
+        validation_result = validate_data(extracted_data, bill_type)
+        logger.info("Step 4: Completed - Validation: %s", 'Valid' if validation_result['valid'] else 'Invalid')
+        if not validation_result['valid'] and 'errors' in validation_result:
+            for error in validation_result['errors']:
+                logger.info("Validation error - Field: %s, Error: %s", error.get('field', 'Unknown'), error.get('error', 'Unknown error'))
+        if 'warnings' in validation_result and validation_result['warnings']:
+            for warning in validation_result['warnings']:
+                logger.info("Validation warning - Field: %s, Warning: %s", warning.get('field', 'Unknown'), warning.get('warning', 'Unknown warning'))
+        stages.append({'stage': 'validation_raw', 'data': validation_result})
+
+        # Step 5: Archive bill
+        logger.info("Step 5: Archiving bill")
+        archived_document = await asyncio.to_thread(move_document, document_path, validation_result['valid'])
+    finally:
+        saved_data = await archive_data_task
+    archive_result = {'document': archived_document, 'data': saved_data}
+    logger.info("Step 5: Completed")
+    logger.info("Step 5 Result: Archived to %s, Data saved to %s", archive_result['document'], archive_result['data'])
 
     return {
         'document_path': document_path,
@@ -252,55 +331,200 @@ def process_document(document_path: str) -> Dict[str, Any]:
         'archive': archive_result
     }
 
-def main():
+def process_document(document_path: str) -> Dict[str, Any]:
+    """
+    Process a single document through the pipeline.
+    
+    Args:
+        document_path: Path to the document.
+        
+    Returns:
+        Dict with processing results.
+    """
+    return asyncio.run(process_document_async(document_path))
+
+async def process_documents_async(document_paths: List[str], concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Process several documents concurrently through the pipeline.
+    
+    Each document still runs its stages in order, but separate documents overlap,
+    so one document's Document Intelligence analysis runs while another waits on
+    OpenAI or the bill-type database lookup.
+    
+    Args:
+        document_paths: Paths to the documents.
+        concurrency: Maximum number of documents processed at the same time.
+        
+    Returns:
+        List of processing results in the same order as document_paths. A document
+        that failed gets {'document_path': ..., 'status': 'error', 'error': ...}.
+    """
+    from src.process_mlb import create_openai_client
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    # One OpenAI client for the whole batch, so MLBs reuse its connections; it is
+    # bound to this event loop and closed before the loop ends
+    try:
+        openai_client = create_openai_client()
+    except ValueError as e:
+        logger.warning("No shared OpenAI client: %s", e)
+        openai_client = None
+
+    async def process_one(document_path: str) -> Dict[str, Any]:
+        async with semaphore:
+            try:
+                return await process_document_async(document_path, openai_client=openai_client)
+            except Exception as e:
+                logger.error("Error processing %s: %s", document_path, e)
+                return {
+                    'document_path': document_path,
+                    'status': 'error',
+                    'error': str(e)
+                }
+
+    try:
+        return await asyncio.gather(*[process_one(path) for path in document_paths])
+    finally:
+        if openai_client is not None:
+            await openai_client.close()
+
+def process_documents(document_paths: List[str], concurrency: int = 4) -> List[Dict[str, Any]]:
+    """
+    Process several documents concurrently; synchronous entry point for process_documents_async.
+    
+    Args:
+        document_paths: Paths to the documents.
+        concurrency: Maximum number of documents processed at the same time.
+        
+    Returns:
+        List of processing results in the same order as document_paths.
+    """
+    return asyncio.run(process_documents_async(document_paths, concurrency))
+
+def print_result_summary(result: Dict[str, Any]) -> None:
+    """Print the end-of-run summary for one processed document."""
+    print(f"\nProcessing complete: {os.path.basename(result['document_path'])}")
+    if result['status'] == 'error':
+        print(f"Error: {result['error']}")
+        return
+    print(f"Bill type: {result['bill_type']}")
+    print(f"Status: {result['status']}")
+    print(f"Validation: {'Passed' if result['validation']['valid'] else 'Invalid'}")
+    print(f"Document archived to: {result['archive']['document']}")
+    print(f"Data saved to: {result['archive']['data']}")
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """
+    Parse the command line arguments.
+    
+    Args:
+        argv: Arguments to parse; defaults to sys.argv[1:].
+        
+    Returns:
+        The parsed arguments.
+    """
+    parser = argparse.ArgumentParser(description="Process telecom bills through the extraction pipeline.")
+    parser.add_argument("--docs-dir", default="data/documents",
+                        help="Directory containing the PDF documents (default: data/documents)")
+    parser.add_argument("--all", action="store_true",
+                        help="Process every document in the documents directory")
+    parser.add_argument("--select", type=int, nargs="+", metavar="N",
+                        help="Process the documents with these numbers from the listing")
+    parser.add_argument("--concurrency", type=int, default=4, metavar="K",
+                        help="Maximum number of documents processed at the same time (default: 4)")
+    parser.add_argument("--no-interactive", action="store_true",
+                        help="Never prompt; requires --all or --select")
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument("--verbose", action="store_true",
+                           help="Print the full extracted fields and bill data for each document")
+    verbosity.add_argument("--quiet", action="store_true",
+                           help="Only log warnings and errors")
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+    return args
+
+def prompt_for_documents(documents: List[str]) -> List[str]:
+    """
+    Ask the user which of the listed documents to process.
+    
+    Args:
+        documents: The available document paths.
+        
+    Returns:
+        The selected document paths.
+    """
+    while True:
+        try:
+            selection = input("\nEnter the number of the document to process ('a' for all, 'q' to quit): ")
+            if selection.lower() == 'q':
+                print("Exiting...")
+                sys.exit(0)
+            if selection.lower() == 'a':
+                return documents
+            index = int(selection) - 1
+            if 0 <= index < len(documents):
+                return [documents[index]]
+            else:
+                print(f"Invalid selection. Please enter a number between 1 and {len(documents)}")
+        except ValueError:
+            print("Invalid input. Please enter a number, 'a' or 'q'")
+
+def main(argv: Optional[List[str]] = None):
     """Main function to run the bill processing pipeline."""
+    args = parse_args(argv)
+    if args.quiet:
+        logging.getLogger().setLevel(logging.WARNING)
+    elif args.verbose:
+        # Only this module's logger, so the SDKs do not start logging every request
+        logger.setLevel(logging.DEBUG)
     try:
         load_dotenv()
         required_vars = ["AZURE_OPENAI_ENDPOINT", "AZURE_OPENAI_API_KEY", "DEPLOYMENT_NAME", 
                          "DOC_INTELLIGENCE_ENDPOINT", "DOC_INTELLIGENCE_KEY"]
         missing_vars = [var for var in required_vars if not os.getenv(var)]
         if missing_vars:
-            logger.error(f"Missing required environment variables: {', '.join(missing_vars)}")
+            logger.error("Missing required environment variables: %s", ", ".join(missing_vars))
             print(f"Error: Missing environment variables: {', '.join(missing_vars)}")
             sys.exit(1)
         
-        documents = list_documents()
+        documents = list_documents(args.docs_dir)
         if not documents:
-            logger.warning("No PDF documents found in data/documents directory")
-            print("No PDF documents found in data/documents directory")
+            logger.warning("No PDF documents found in %s directory", args.docs_dir)
+            print(f"No PDF documents found in {args.docs_dir} directory")
             sys.exit(0)
         
         print("\nAvailable documents:")
         for i, doc in enumerate(documents):
             print(f"{i+1}. {os.path.basename(doc)}")
         
-        while True:
-            try:
-                selection = input("\nEnter the number of the document to process (or 'q' to quit): ")
-                if selection.lower() == 'q':
-                    print("Exiting...")
-                    sys.exit(0)
-                index = int(selection) - 1
-                if 0 <= index < len(documents):
-                    selected_document = documents[index]
-                    break
-                else:
-                    print(f"Invalid selection. Please enter a number between 1 and {len(documents)}")
-            except ValueError:
-                print("Invalid input. Please enter a number or 'q'")
+        if args.all:
+            selected_documents = documents
+        elif args.select:
+            invalid = [n for n in args.select if not 1 <= n <= len(documents)]
+            if invalid:
+                print(f"Error: Invalid selection {invalid}. Please use numbers between 1 and {len(documents)}")
+                sys.exit(2)
+            selected_documents = [documents[n - 1] for n in args.select]
+        elif args.no_interactive or not sys.stdin.isatty():
+            print("Error: Nothing selected. Pass --all or --select when running non-interactively")
+            sys.exit(2)
+        else:
+            selected_documents = prompt_for_documents(documents)
         
-        print(f"\nProcessing document: {os.path.basename(selected_document)}")
-        result = process_document(selected_document)
+        if len(selected_documents) == 1:
+            print(f"\nProcessing document: {os.path.basename(selected_documents[0])}")
+            results = [process_document(selected_documents[0])]
+        else:
+            print(f"\nProcessing {len(selected_documents)} documents")
+            results = process_documents(selected_documents, concurrency=args.concurrency)
         
-        print("\nProcessing complete!")
-        print(f"Bill type: {result['bill_type']}")
-        print(f"Status: {result['status']}")
-        print(f"Validation: {'Passed' if result['validation']['valid'] else 'Invalid'}")
-        print(f"Document archived to: {result['archive']['document']}")
-        print(f"Data saved to: {result['archive']['data']}")
+        for result in results:
+            print_result_summary(result)
     
     except Exception as e:
-        logger.error(f"Error in main function: {str(e)}")
+        logger.error("Error in main function: %s", e)
         print(f"Error: {str(e)}")
         sys.exit(1)
 
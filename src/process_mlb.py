@@ -7,19 +7,66 @@ Module for processing Multi-Location Bills (MLB).
 
 import os
 import json
+import asyncio
 import logging
 import time
 import re
-from typing import Dict, Any, List, Optional
+import functools
+import hashlib
+from typing import Dict, Any, List, Optional, Tuple
 from langchain.docstore.document import Document
-from openai import AzureOpenAI
-from tqdm import tqdm
+from openai import AsyncAzureOpenAI
+from tqdm.asyncio import tqdm_asyncio
+import numpy as np
 import datetime
+from src.validate import to_amount
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Maximum number of chunk requests in flight to Azure OpenAI at once
+MAX_CONCURRENT_REQUESTS = 8
+
+# Responses to identical prompts, reused across runs
+LLM_CACHE_DIR = os.path.join("data", ".llm_cache")
+
+# Upper bound on generated tokens per chunk; a chunk's sub-account JSON stays well below it
+MAX_OUTPUT_TOKENS = int(os.getenv("MLB_MAX_OUTPUT_TOKENS", "4096"))
+
+# Potential header patterns for different bill formats
+HEADER_PATTERNS = [
+    r'Service Location \d+ of \d+',  # Spectrum format
+    r'Location:',                    # Comcast format
+    r'Site \d+',                     # Other potential format
+    r'Account \d+',                  # Another potential format
+    r'Location Summary',             # For summary tables
+]
+
+# Master summary lines (e.g., "Subtotal | ... | $754.18")
+MASTER_SUMMARY_PATTERN = r'^\| Subtotal \|.*\|\s*[\$]?[-]?\d+\.\d{2}\s*\|.*\|\s*[\$]?[-]?\d+\.\d{2}\s*\|.*$'
+
+# Headers and master summary lines found in one scan of the content. The summary
+# alternative is a zero-width lookahead so headers later on the same line still match.
+SECTION_RE = re.compile(
+    rf"(?P<header>{'|'.join(HEADER_PATTERNS)})|(?P<summary>(?={MASTER_SUMMARY_PATTERN}))",
+    re.MULTILINE
+)
+
+# 9-digit sub-account numbers (common in telecom bills)
+ACCOUNT_NUMBER_RE = re.compile(r'\b\d{9}\b')
+
+# Labeled account numbers (e.g., "Account #: 12345")
+LABELED_ACCOUNT_RE = re.compile(r'(?i)(account\s*(?:#|number|no\.?)\s*[:\s]?\s*)([a-zA-Z0-9\s\-]+)')
+
+# Any digit; a chunk without one holds no account number or charge
+DIGIT_RE = re.compile(r'\d')
+
+# Values after an account label that are not account numbers
+DATE_RE = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}')
+ZIP_RE = re.compile(r'\d{5}(?:-\d{4})?$')
+PHONE_RE = re.compile(r'\d{3}-\d{3}-\d{4}')
+
 def apply_tags_to_content(content: str, styles: List[Dict[str, Any]]) -> str:
     """
     Apply bold tags to content based on style information.
@@ -31,20 +78,31 @@ def apply_tags_to_content(content: str, styles: List[Dict[str, Any]]) -> str:
     Returns:
         Content with bold tags applied.
     """
-    logger.info("Applying style tags to content")
-    start_time = time.time()
-    tagged_content = content
-    for style in styles:
-        for span in style.get('spans', []):
-            offset, length = span['offset'], span['length']
-            if style.get('fontWeight') == 'bold':
-                tagged_content = (
-                    tagged_content[:offset] +
-                    f"<b>{tagged_content[offset:offset + length]}</b>" +
-                    tagged_content[offset + length:]
-                )
-    end_time = time.time()
-    logger.info(f"Style tags applied in {end_time - start_time:.2f} seconds")
+    timed = logger.isEnabledFor(logging.INFO)
+    if timed:
+        logger.info("Applying style tags to content")
+        start_time = time.perf_counter()
+    # Span offsets refer to the untagged content, so build the output in one pass
+    spans = sorted(
+        (span['offset'], span['length'])
+        for style in styles if style.get('fontWeight') == 'bold'
+        for span in style.get('spans', [])
+    )
+    parts = []
+    pos = 0
+    for offset, length in spans:
+        if offset < pos:
+            # Skip spans overlapping one that is already tagged
+            continue
+        parts.append(content[pos:offset])
+        parts.append("<b>")
+        parts.append(content[offset:offset + length])
+        parts.append("</b>")
+        pos = offset + length
+    parts.append(content[pos:])
+    tagged_content = "".join(parts)
+    if timed:
+        logger.info("Style tags applied in %.2f seconds", time.perf_counter() - start_time)
     return tagged_content
 
 def semantic_chunking(document: Dict[str, Any], file_name: str) -> List[Document]:
@@ -59,196 +117,384 @@ def semantic_chunking(document: Dict[str, Any], file_name: str) -> List[Document
     Returns:
         List of document chunks.
     """
-    logger.info("Starting dynamic chunking")
-    start_time = time.time()
+    timed = logger.isEnabledFor(logging.INFO)
+    if timed:
+        logger.info("Starting dynamic chunking")
+        start_time = time.perf_counter()
 
     content = apply_tags_to_content(document['content'], document.get('styles', [])) if 'styles' in document else document['content']
 
-    # Define potential header patterns for different bill formats
-    header_patterns = [
-        r'Service Location \d+ of \d+',  # Spectrum format
-        r'Location:',                    # Comcast format
-        r'Site \d+',                     # Other potential format
-        r'Account \d+',                  # Another potential format
-        r'Location Summary',             # For summary tables
-    ]
-    header_regex = re.compile('|'.join(header_patterns))
-
-    # Define pattern for master summary lines (e.g., "Subtotal | ... | $754.18")
-    master_summary_pattern = r'^\| Subtotal \|.*\|\s*[\$]?[-]?\d+\.\d{2}\s*\|.*\|\s*[\$]?[-]?\d+\.\d{2}\s*\|.*$'
-
-    headers = list(header_regex.finditer(content))
+    # Header start offsets, and for each header the offset of the first master
+    # summary line in its section
+    headers = []
+    summary_starts = {}
+    for match in SECTION_RE.finditer(content):
+        if match.lastgroup == 'header':
+            headers.append(match.start())
+        elif headers:
+            summary_starts.setdefault(len(headers) - 1, match.start())
     chunks = []
 
     if headers:
-        if headers[0].start() > 0:
-            chunks.append(Document(page_content=content[:headers[0].start()].strip(), metadata={"source": f"{file_name}.md"}))
-        for i in range(len(headers)):
-            start = headers[i].start()
-            end = headers[i + 1].start() if i + 1 < len(headers) else len(content)
-            chunk_content = content[start:end].strip()
-
+        if headers[0] > 0:
+            chunks.append(Document(page_content=content[:headers[0]].strip(), metadata={"source": f"{file_name}.md"}))
+        for i, start in enumerate(headers):
             # Truncate chunk before master summary
-            summary_match = re.search(master_summary_pattern, chunk_content, re.MULTILINE)
-            if summary_match:
-                chunk_content = chunk_content[:summary_match.start()].strip()
+            if i in summary_starts:
+                end = summary_starts[i]
+            else:
+                end = headers[i + 1] if i + 1 < len(headers) else len(content)
+            chunk_content = content[start:end].strip()
 
             chunks.append(Document(page_content=chunk_content, metadata={"source": f"{file_name}.md"}))
     else:
         logger.warning("No headers found, falling back to content clustering")
-        potential_chunks = re.split(r'\n\n', content)
+        potential_chunks = content.split('\n\n')
         for chunk in potential_chunks:
             if chunk.strip():
                 chunks.append(Document(page_content=chunk.strip(), metadata={"source": f"{file_name}.md"}))
 
-    end_time = time.time()
-    logger.info(f"Dynamic chunking completed in {end_time - start_time:.2f} seconds. Number of chunks: {len(chunks)}")
+    if timed:
+        logger.info("Dynamic chunking completed in %.2f seconds. Number of chunks: %d", time.perf_counter() - start_time, len(chunks))
     return chunks
 
-def preprocess_chunk(content: str) -> str:
+def bold_labeled_account_number(match: re.Match) -> str:
+    """Wrap the number after an account label in bold tags, leaving dates, ZIP codes and phone numbers alone."""
+    prefix = match.group(1)
+    account_num = match.group(2).strip()
+    if (DATE_RE.match(account_num) or     # Skip dates
+        ZIP_RE.match(account_num) or      # Skip ZIP codes
+        PHONE_RE.match(account_num)):     # Skip phone numbers
+        return match.group(0)
+    return f"{prefix}<b>{account_num}</b>"
+
+def preprocess_chunk(content: str) -> Tuple[str, Optional[str]]:
     """
     Preprocess a document chunk to enhance sub-account number identification.
 
+    Each pattern is applied in a single substitution pass, so every occurrence
+    is wrapped exactly once.
+
     Args:
         content: The document chunk content.
 
     Returns:
-        Preprocessed content with enhanced sub-account numbers.
+        Tuple of (preprocessed content with enhanced sub-account numbers, first
+        9-digit number in the chunk or None), the latter for use as a fallback
+        sub-account number without scanning the chunk again.
     """
-    enhanced_content = content
+    account_numbers = []
+
+    def bold_account_number(match: re.Match) -> str:
+        account_numbers.append(match.group(0))
+        return f"<b>{match.group(0)}</b>"
 
     # Bold 9-digit sub-account numbers (common in telecom bills)
-    account_number_pattern = r'\b\d{9}\b'
-    matches = re.finditer(account_number_pattern, enhanced_content)
-    for match in matches:
-        account_num = match.group(0)
-        enhanced_content = enhanced_content.replace(account_num, f"<b>{account_num}</b>")
-
-    # Bold labeled account numbers (e.g., "Account #: 12345")
-    account_patterns = [
-        r'(?i)(account\s*(?:#|number|no\.?)\s*[:\s]?\s*)([a-zA-Z0-9\s\-]+)'
-    ]
-    for pattern in account_patterns:
-        matches = re.finditer(pattern, enhanced_content)
-        for match in matches:
-            prefix = match.group(1)
-            account_num = match.group(2).strip()
-            if (re.match(r'\d{1,2}/\d{1,2}/\d{2,4}', account_num) or    # Skip dates
-                re.match(r'\d{5}(?:-\d{4})?$', account_num) or          # Skip ZIP codes
-                re.match(r'\d{3}-\d{3}-\d{4}', account_num)):           # Skip phone numbers
-                continue
-            enhanced_content = enhanced_content.replace(match.group(0), f"{prefix}<b>{account_num}</b>")
+    enhanced_content = ACCOUNT_NUMBER_RE.sub(bold_account_number, content)
+    first_account_number = account_numbers[0] if account_numbers else None
 
-    return enhanced_content
+    # Bold labeled account numbers (e.g., "Account #: 12345"); a substring check
+    # in C is much cheaper than a case-insensitive regex scan when there is no label
+    if 'account' in enhanced_content.lower():
+        enhanced_content = LABELED_ACCOUNT_RE.sub(bold_labeled_account_number, enhanced_content)
+    return enhanced_content, first_account_number
 
-def get_llm_response(
-    query: str,
-    prompt_file: str = "telecom_prompt.txt",
-    force_json: bool = True,
+def resolve_openai_config(
     openai_endpoint: Optional[str] = None,
     openai_api_key: Optional[str] = None,
     deployment_name: Optional[str] = None
-) -> str:
+) -> Tuple[str, str, str]:
     """
-    Get response from Azure OpenAI model with a generalized prompt, enhanced to focus
-    on sub-account-specific totals.
+    Fill in missing Azure OpenAI settings from environment variables.
 
     Args:
-        query: The query to send to the model.
-        prompt_file: Path to the prompt file.
-        force_json: Whether to force JSON output.
         openai_endpoint: Azure OpenAI endpoint.
         openai_api_key: Azure OpenAI API key.
         deployment_name: Azure OpenAI deployment name.
 
     Returns:
-        The model's response.
+        Tuple of (endpoint, api_key, deployment_name).
+
+    Raises:
+        ValueError: If any setting is missing.
+    """
+    openai_endpoint = openai_endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
+    openai_api_key = openai_api_key or os.getenv("AZURE_OPENAI_API_KEY")
+    deployment_name = deployment_name or os.getenv("DEPLOYMENT_NAME")
+
+    if not all([openai_endpoint, openai_api_key, deployment_name]):
+        raise ValueError("Missing required OpenAI credentials")
+    return openai_endpoint, openai_api_key, deployment_name
+
+@functools.lru_cache(maxsize=8)
+def load_prompt_base(prompt_file: str, mtime: float) -> str:
+    """
+    Read a prompt file and append the sub-account total instructions.
+
+    Cached per (path, modification time), so edits to the prompt are picked up.
+
+    Args:
+        prompt_file: Path to the prompt file.
+        mtime: The file's modification time, used as part of the cache key.
+
+    Returns:
+        The prompt text that precedes the document chunk.
+    """
+    with open(prompt_file, "r", encoding="utf-8") as file:
+        prompt_base = file.read().strip()
+
+    # Append instructions for precise sub-account total extraction
+    return prompt_base + (
+        "\n\nExtract the total due for the sub-account from its specific \"Subtotal\" line within the chunk. "
+        "This is typically a single line showing the total for that sub-account, not the master account's total. "
+        "Ignore any lines that appear to be summaries for the entire bill, such as \"CURRENT CHARGES SUBTOTAL\" or \"BALANCE DUE\"."
+    )
+
+def build_prompt(query: str, prompt_file: str) -> str:
+    """
+    Build the sub-account extraction prompt for a document chunk.
+
+    Args:
+        query: The document chunk.
+        prompt_file: Path to the prompt file.
+
+    Returns:
+        The full prompt.
+
+    Raises:
+        FileNotFoundError: If the prompt file does not exist.
     """
     try:
-        logger.info("Requesting response from Azure OpenAI")
-        if not os.path.exists(prompt_file):
-            raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
+        mtime = os.path.getmtime(prompt_file)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Prompt file not found: {prompt_file}")
 
-        openai_endpoint = openai_endpoint or os.getenv("AZURE_OPENAI_ENDPOINT")
-        openai_api_key = openai_api_key or os.getenv("AZURE_OPENAI_API_KEY")
-        deployment_name = deployment_name or os.getenv("DEPLOYMENT_NAME")
+    return f"{load_prompt_base(prompt_file, mtime)}\n\nDocument chunk: {query}"
 
-        if not all([openai_endpoint, openai_api_key, deployment_name]):
-            raise ValueError("Missing required OpenAI credentials")
+def create_openai_client(
+    openai_endpoint: Optional[str] = None,
+    openai_api_key: Optional[str] = None
+) -> AsyncAzureOpenAI:
+    """
+    Create an async Azure OpenAI client to share across the bills of one event loop.
 
-        client = AzureOpenAI(
-            azure_endpoint=openai_endpoint,
-            api_key=openai_api_key,
-            api_version="2024-02-01"
-        )
+    The caller owns the client and must close it before the loop ends.
 
-        with open(prompt_file, "r", encoding="utf-8") as file:
-            prompt_base = file.read().strip()
+    Args:
+        openai_endpoint: Azure OpenAI endpoint. If None, uses environment variable.
+        openai_api_key: Azure OpenAI API key. If None, uses environment variable.
 
-        # Append instructions for precise sub-account total extraction
-        prompt_base += (
-            "\n\nExtract the total due for the sub-account from its specific \"Subtotal\" line within the chunk. "
-            "This is typically a single line showing the total for that sub-account, not the master account's total. "
-            "Ignore any lines that appear to be summaries for the entire bill, such as \"CURRENT CHARGES SUBTOTAL\" or \"BALANCE DUE\"."
-        )
+    Returns:
+        Azure OpenAI async client.
+
+    Raises:
+        ValueError: If any OpenAI setting is missing.
+    """
+    openai_endpoint, openai_api_key, _ = resolve_openai_config(openai_endpoint, openai_api_key)
+    return AsyncAzureOpenAI(
+        azure_endpoint=openai_endpoint,
+        api_key=openai_api_key,
+        api_version="2024-02-01"
+    )
+
+def completion_text(response) -> str:
+    """
+    Return the text of a chat completion, refusing output cut off by the token limit.
+
+    Args:
+        response: The chat completion.
+
+    Returns:
+        The generated text.
+
+    Raises:
+        ValueError: If generation stopped at max_tokens, leaving incomplete JSON.
+    """
+    choice = response.choices[0]
+    if choice.finish_reason == "length":
+        raise ValueError(f"Response truncated at {MAX_OUTPUT_TOKENS} tokens; raise MLB_MAX_OUTPUT_TOKENS")
+    return choice.message.content
+
+def get_cache_key(prompt: str, deployment_name: str, force_json: bool) -> str:
+    """Build the response cache key from everything that affects the model output."""
+    key_source = f"{deployment_name}\0{force_json}\0{MAX_OUTPUT_TOKENS}\0{prompt}"
+    return hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+
+def read_cached_response(key: str) -> Optional[str]:
+    """Return the cached LLM response for a key, or None on a miss."""
+    cache_path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)["response"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+def write_cached_response(key: str, response: str) -> None:
+    """Store an LLM response in the cache; failures are logged and ignored."""
+    cache_path = os.path.join(LLM_CACHE_DIR, f"{key}.json")
+    try:
+        os.makedirs(LLM_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"response": response}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning("Could not write LLM cache entry %s: %s", key, e)
+
+async def get_llm_response_async(
+    client: AsyncAzureOpenAI,
+    query: str,
+    deployment_name: str,
+    prompt_file: str = "telecom_prompt.txt",
+    force_json: bool = True
+) -> str:
+    """
+    Get a sub-account extraction response from Azure OpenAI for a document chunk.
 
-        prompt = f"{prompt_base}\n\nDocument chunk: {query}"
-        start_time = time.time()
+    Identical prompts are answered from the on-disk response cache, which only
+    holds responses that parsed as JSON when force_json is set.
 
-        response = client.chat.completions.create(
+    Args:
+        client: The Azure OpenAI async client.
+        query: The query to send to the model.
+        deployment_name: Azure OpenAI deployment name.
+        prompt_file: Path to the prompt file.
+        force_json: Whether to force JSON output.
+
+    Returns:
+        The model's response.
+    """
+    try:
+        prompt = build_prompt(query, prompt_file)
+
+        # Extraction runs at temperature 0, so an identical prompt yields a reusable answer
+        cache_key = get_cache_key(prompt, deployment_name, force_json)
+        cached = read_cached_response(cache_key)
+        if cached is not None:
+            logger.info("Azure OpenAI response served from cache")
+            return cached
+
+        timed = logger.isEnabledFor(logging.INFO)
+        start_time = time.perf_counter() if timed else 0.0
+
+        response = await client.chat.completions.create(
             model=deployment_name,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
+            max_tokens=MAX_OUTPUT_TOKENS,
             response_format={"type": "json_object"} if force_json else None
         )
 
-        end_time = time.time()
-        logger.info(f"Azure OpenAI response received in {end_time - start_time:.2f} seconds")
-        return response.choices[0].message.content
+        if timed:
+            logger.info("Azure OpenAI response received in %.2f seconds", time.perf_counter() - start_time)
+        content = completion_text(response)
+        # Only cache an answer that parses; a malformed one would otherwise be
+        # replayed on every later run instead of being requested again
+        try:
+            if force_json:
+                json.loads(content)
+            write_cached_response(cache_key, content)
+        except ValueError:
+            logger.warning("Not caching Azure OpenAI response that is not valid JSON")
+        return content
 
     except Exception as e:
-        logger.error(f"Error getting LLM response: {str(e)}")
+        logger.error("Error getting LLM response: %s", e)
         raise
 
-def extract_fallback_sub_account(chunk_content: str) -> str:
+def serialize_for_logging(obj):
     """
-    Fallback to extract the first 9-digit number in the chunk.
+    Convert date objects to strings for JSON serialization in logging.
 
-    Args:
-        chunk_content: The document chunk content.
+    Used as json.dumps' default hook, so nested structures are converted in the
+    encoder's own walk instead of a separate recursive copy.
+    """
+    if isinstance(obj, (datetime.date, datetime.datetime)):
+        return obj.isoformat()  # Converts date to ISO 8601 string (e.g., "2024-10-01")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
-    Returns:
-        The first 9-digit number found, or "Unknown".
+def write_debug_chunks(document_name: str, enhanced_contents: List[str], debug_dir: str = "data/debug") -> None:
     """
-    account_number_pattern = r'\b\d{9}\b'
-    match = re.search(account_number_pattern, chunk_content)
-    return match.group(0) if match else "Unknown"
+    Save each preprocessed chunk to the debug directory for inspection.
 
-def serialize_for_logging(obj):
+    Args:
+        document_name: The name of the document file.
+        enhanced_contents: The preprocessed chunks, in order.
+        debug_dir: Directory for the chunk files.
+    """
+    os.makedirs(debug_dir, exist_ok=True)
+    for i, enhanced_content in enumerate(enhanced_contents):
+        with open(os.path.join(debug_dir, f"{document_name}_chunk_{i+1}.txt"), "w") as f:
+            f.write(enhanced_content)
+
+def is_blank_total(total_due: Any) -> bool:
+    """Check whether an extracted total_due, string or number, is absent or blank."""
+    return total_due is None or not str(total_due).strip()
+
+def correct_sub_account_totals(sub_accounts: List[Dict[str, Any]]) -> None:
     """
-    Recursively convert date objects to strings for JSON serialization in logging.
+    Validate each sub-account's total_due against the sum of its line items, in place.
+
+    Args:
+        sub_accounts: The extracted sub-accounts.
     """
-    if isinstance(obj, dict):
-        return {k: serialize_for_logging(v) for k, v in obj.items()}
-    elif isinstance(obj, list):
-        return [serialize_for_logging(item) for item in obj]
-    elif isinstance(obj, (datetime.date, datetime.datetime)):
-        return obj.isoformat()  # Converts date to ISO 8601 string (e.g., "2024-10-01")
-    else:
-        return obj
+    itemized = [sub_account for sub_account in sub_accounts if sub_account.get('line_items')]
+
+    # Flatten all line-item charges with the index of their sub-account, then sum
+    # them per sub-account in one NumPy pass
+    group_ids = []
+    charges = []
+    for index, sub_account in enumerate(itemized):
+        for line_item in sub_account['line_items']:
+            if 'total' in line_item:
+                try:
+                    charges.append(to_amount(line_item['total']))
+                    group_ids.append(index)
+                except ValueError:
+                    logger.warning("Invalid total value in line item: %s", line_item['total'])
+    calculated_totals = np.bincount(
+        np.array(group_ids, dtype=np.intp),
+        weights=np.array(charges, dtype=np.float64),
+        minlength=len(itemized)
+    )
+
+    for sub_account, calculated_total in zip(itemized, calculated_totals.tolist()):
+        if is_blank_total(sub_account.get('total_due')):
+            sub_account['total_due'] = f"${calculated_total:.2f}"
+        else:
+            try:
+                extracted_total = to_amount(sub_account['total_due'])
+                if abs(calculated_total - extracted_total) > 0.01:
+                    logger.warning(
+                        "Total due mismatch for sub-account %s: Extracted $%s, but line items sum to $%s",
+                        sub_account.get('sub_account_number', 'Unknown'), extracted_total, calculated_total
+                    )
+                    sub_account['total_due'] = f"${calculated_total:.2f}"
+            except ValueError:
+                logger.warning("Invalid total_due value: %s", sub_account['total_due'])
+                sub_account['total_due'] = f"${calculated_total:.2f}"
 
-def process_mlb(
+    for sub_account in sub_accounts:
+        if not sub_account.get('line_items') and is_blank_total(sub_account.get('total_due')):
+            sub_account['total_due'] = "$0.00"
+
+async def process_mlb_async(
     analysis_result: Dict[str, Any],
     master_account: Dict[str, Any],
     document_name: str,
     prompt_file: str = "telecom_prompt.txt",
     openai_endpoint: Optional[str] = None,
     openai_api_key: Optional[str] = None,
-    deployment_name: Optional[str] = None
+    deployment_name: Optional[str] = None,
+    concurrency: int = MAX_CONCURRENT_REQUESTS,
+    client: Optional[AsyncAzureOpenAI] = None
 ) -> Dict[str, Any]:
     """
     Process a Multi-Location Bill (MLB) using OpenAI, with validation for sub-account totals.
 
+    Chunks are sent to Azure OpenAI concurrently, at most `concurrency` at a time,
+    and their sub-accounts are collected in chunk order.
+
     Args:
         analysis_result: The result from document analysis (expects prebuilt-layout model).
         master_account: Pre-extracted master account data from prebuilt-invoice analysis.
@@ -257,91 +503,143 @@ def process_mlb(
         openai_endpoint: Azure OpenAI endpoint.
         openai_api_key: Azure OpenAI API key.
         deployment_name: Azure OpenAI deployment name.
+        concurrency: Maximum number of chunk requests in flight at once.
+        client: Shared async client from create_openai_client. If None, a client is
+            created for this bill and closed when it is done.
 
     Returns:
         Dict with extracted MLB data.
     """
     try:
-        logger.info(f"Processing Multi-Location Bill (MLB): {document_name}")
+        logger.info("Processing Multi-Location Bill (MLB): %s", document_name)
 
         # Serialize master_account for logging purposes only
-        logger.info(f"Received master account data: {json.dumps(serialize_for_logging(master_account), indent=2)}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Received master account data: %s", json.dumps(master_account, indent=2, default=serialize_for_logging))
+
+        openai_endpoint, openai_api_key, deployment_name = resolve_openai_config(
+            openai_endpoint, openai_api_key, deployment_name
+        )
 
         # Chunk the document dynamically for sub-accounts
         chunks = semantic_chunking(analysis_result, document_name)
-        sub_accounts = []
 
-        for i, chunk in enumerate(tqdm(chunks)):
-            logger.info(f"Processing chunk {i+1}/{len(chunks)}")
-            content = chunk.page_content
-            enhanced_content = preprocess_chunk(content)
-
-            # Debugging: Save preprocessed chunk
-            debug_dir = "data/debug"
-            os.makedirs(debug_dir, exist_ok=True)
-            with open(os.path.join(debug_dir, f"{document_name}_chunk_{i+1}.txt"), "w") as f:
-                f.write(enhanced_content)
-
-            response = get_llm_response(
-                enhanced_content,
-                prompt_file=prompt_file,
-                force_json=True,
-                openai_endpoint=openai_endpoint,
-                openai_api_key=openai_api_key,
-                deployment_name=deployment_name
-            )
+        preprocessed = [preprocess_chunk(chunk.page_content) for chunk in chunks]
+        enhanced_contents = [enhanced_content for enhanced_content, _ in preprocessed]
+
+        # Debugging: Save preprocessed chunks while the requests are in flight
+        debug_task = asyncio.create_task(asyncio.to_thread(write_debug_chunks, document_name, enhanced_contents))
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        # Without a shared client, one is opened for this bill alone
+        owns_client = client is None
+        if owns_client:
+            client = create_openai_client(openai_endpoint, openai_api_key)
+
+        try:
+            async def process_chunk(i: int, enhanced_content: str) -> Optional[str]:
+                # Filler chunks cannot yield a sub-account, so skip the request
+                if not DIGIT_RE.search(enhanced_content):
+                    logger.debug("Skipping chunk %d/%d, no account number or charges", i + 1, len(chunks))
+                    return None
+                async with semaphore:
+                    logger.info("Processing chunk %d/%d", i + 1, len(chunks))
+                    return await get_llm_response_async(
+                        client,
+                        enhanced_content,
+                        deployment_name,
+                        prompt_file=prompt_file,
+                        force_json=True
+                    )
+
+            # Identical chunks get identical answers, so send each distinct chunk only once
+            first_index = {}
+            for i, enhanced_content in enumerate(enhanced_contents):
+                first_index.setdefault(enhanced_content, i)
+            tasks = [
+                asyncio.create_task(process_chunk(i, enhanced_content))
+                for enhanced_content, i in first_index.items()
+            ]
+            try:
+                unique_responses = await tqdm_asyncio.gather(*tasks)
+            except BaseException:
+                # One failed chunk fails the bill, so stop the other requests before the
+                # client is closed or more quota is spent on them
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+            response_by_content = dict(zip(first_index, unique_responses))
+            responses = [response_by_content[enhanced_content] for enhanced_content in enhanced_contents]
+        finally:
+            if owns_client:
+                await client.close()
+            await debug_task
 
+        sub_accounts = []
+        for (_, first_account_number), response in zip(preprocessed, responses):
+            if response is None:
+                continue
             data = json.loads(response)
 
             if "sub_accounts" in data:
                 for sub_account in data["sub_accounts"]:
                     if not sub_account.get('sub_account_number') or sub_account['sub_account_number'] == "Unknown":
-                        sub_account['sub_account_number'] = extract_fallback_sub_account(enhanced_content)
+                        sub_account['sub_account_number'] = first_account_number or "Unknown"
                 sub_accounts.extend(data["sub_accounts"])
 
         # Validate and correct sub-account totals
         logger.info("Validating and correcting sub-account totals")
-        for sub_account in sub_accounts:
-            if 'line_items' in sub_account and sub_account['line_items']:
-                calculated_total = 0.0
-                for line_item in sub_account['line_items']:
-                    if 'total' in line_item:
-                        try:
-                            charge = float(line_item['total'].replace('$', '').replace(',', ''))
-                            calculated_total += charge
-                        except ValueError:
-                            logger.warning(f"Invalid total value in line item: {line_item['total']}")
-
-                if 'total_due' not in sub_account or not sub_account['total_due'].strip():
-                    sub_account['total_due'] = f"${calculated_total:.2f}"
-                else:
-                    try:
-                        extracted_total = float(sub_account['total_due'].replace('$', '').replace(',', ''))
-                        if abs(calculated_total - extracted_total) > 0.01:
-                            logger.warning(
-                                f"Total due mismatch for sub-account {sub_account.get('sub_account_number', 'Unknown')}: "
-                                f"Extracted ${extracted_total}, but line items sum to ${calculated_total}"
-                            )
-                            sub_account['total_due'] = f"${calculated_total:.2f}"
-                    except ValueError:
-                        logger.warning(f"Invalid total_due value: {sub_account['total_due']}")
-                        sub_account['total_due'] = f"${calculated_total:.2f}"
-            elif 'total_due' not in sub_account or not sub_account['total_due'].strip():
-                sub_account['total_due'] = "$0.00"
+        correct_sub_account_totals(sub_accounts)
 
         output = {
             "master_account": master_account,
             "sub_accounts": sub_accounts
         }
 
-        logger.info(f"MLB processing complete. Master account: {master_account.get('account_number', 'N/A')}")
-        logger.info(f"Number of sub-accounts: {len(sub_accounts)}")
+        logger.info("MLB processing complete. Master account: %s", master_account.get('account_number', 'N/A'))
+        logger.info("Number of sub-accounts: %d", len(sub_accounts))
         return output
 
     except Exception as e:
-        logger.error(f"Error processing MLB: {str(e)}")
+        logger.error("Error processing MLB: %s", e)
         raise
 
+def process_mlb(
+    analysis_result: Dict[str, Any],
+    master_account: Dict[str, Any],
+    document_name: str,
+    prompt_file: str = "telecom_prompt.txt",
+    openai_endpoint: Optional[str] = None,
+    openai_api_key: Optional[str] = None,
+    deployment_name: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Process a Multi-Location Bill (MLB); synchronous entry point for process_mlb_async.
+
+    Args:
+        analysis_result: The result from document analysis (expects prebuilt-layout model).
+        master_account: Pre-extracted master account data from prebuilt-invoice analysis.
+        document_name: The name of the document file.
+        prompt_file: Path to the MLB prompt file.
+        openai_endpoint: Azure OpenAI endpoint.
+        openai_api_key: Azure OpenAI API key.
+        deployment_name: Azure OpenAI deployment name.
+
+    Returns:
+        Dict with extracted MLB data.
+    """
+    return asyncio.run(process_mlb_async(
+        analysis_result,
+        master_account,
+        document_name,
+        prompt_file=prompt_file,
+        openai_endpoint=openai_endpoint,
+        openai_api_key=openai_api_key,
+        deployment_name=deployment_name
+    ))
+
 if __name__ == "__main__":
     from src.analyze import analyze_document
     from dotenv import load_dotenv
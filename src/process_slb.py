@@ -9,6 +9,7 @@ import os
 import json
 import logging
 import time
+import functools
 from typing import Dict, Any, Optional
 from openai import AzureOpenAI
 
@@ -16,6 +17,42 @@ from openai import AzureOpenAI
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bound on generated tokens; an SLB's account and line-item JSON stays well below it
+MAX_OUTPUT_TOKENS = int(os.getenv("SLB_MAX_OUTPUT_TOKENS", "4096"))
+
+@functools.lru_cache(maxsize=8)
+def load_prompt(prompt_file: str, mtime: float) -> str:
+    """
+    Read a prompt file, cached per (path, modification time) so edits are picked up.
+    
+    Args:
+        prompt_file: Path to the prompt file.
+        mtime: The file's modification time, used as part of the cache key.
+        
+    Returns:
+        The prompt text.
+    """
+    with open(prompt_file, "r", encoding="utf-8") as file:
+        return file.read().strip()
+
+@functools.lru_cache(maxsize=4)
+def get_openai_client(openai_endpoint: str, openai_api_key: str) -> AzureOpenAI:
+    """
+    Return a shared Azure OpenAI client for the endpoint, created on first use.
+    
+    Args:
+        openai_endpoint: Azure OpenAI endpoint.
+        openai_api_key: Azure OpenAI API key.
+        
+    Returns:
+        Azure OpenAI client.
+    """
+    return AzureOpenAI(
+        azure_endpoint=openai_endpoint,
+        api_key=openai_api_key,
+        api_version="2024-02-01"
+    )
+
 def process_slb(
     analysis_result: Dict[str, Any],
     prompt_file: str = "prompts/slb_prompt.txt",
@@ -64,16 +101,11 @@ def process_slb(
             if not deployment_name:
                 raise ValueError("OpenAI deployment name not provided and not found in environment variables")
         
-        # Initialize the OpenAI client
-        client = AzureOpenAI(
-            azure_endpoint=openai_endpoint,
-            api_key=openai_api_key,
-            api_version="2024-02-01"
-        )
+        # Reuse the OpenAI client and its connection pool across bills
+        client = get_openai_client(openai_endpoint, openai_api_key)
         
         # Read the SLB prompt
-        with open(prompt_file, "r", encoding="utf-8") as file:
-            prompt_base = file.read().strip()
+        prompt_base = load_prompt(prompt_file, os.path.getmtime(prompt_file))
         
         # Get the document content
         content = analysis_result.get('content', '')
@@ -89,14 +121,18 @@ def process_slb(
             model=deployment_name,
             messages=[{"role": "user", "content": prompt}],
             temperature=0.0,
+            max_tokens=MAX_OUTPUT_TOKENS,
             response_format={"type": "json_object"}
         )
         
         end_time = time.time()
         logger.info(f"Processing response received in {end_time - start_time:.2f} seconds")
         
-        # Parse the response
-        extracted_data = json.loads(response.choices[0].message.content)
+        # Parse the response; output cut off at max_tokens is incomplete JSON
+        choice = response.choices[0]
+        if choice.finish_reason == "length":
+            raise ValueError(f"Response truncated at {MAX_OUTPUT_TOKENS} tokens; raise SLB_MAX_OUTPUT_TOKENS")
+        extracted_data = json.loads(choice.message.content)
         
         # Log extraction results
         account = extracted_data.get('account', {})
@@ -9,13 +9,151 @@ import os
 import json
 import logging
 import time
-from typing import Dict, Any, List, Optional, Tuple
-from openai import AzureOpenAI
+import functools
+import math
+import re
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+from dateutil import parser as date_parser
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Strips currency symbols, thousands separators and stray spaces from amounts;
+# the MLB extractors import it so they clean amounts the same way validation does
+CURRENCY_STRIP = str.maketrans('', '', '$, ')
+
+# A cleaned amount: optional sign, digits with an optional fraction, optional exponent
+AMOUNT_RE = re.compile(r'[-+]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][-+]?\d+)?')
+
+@functools.lru_cache(maxsize=4096)
+def parse_amount(amount: str) -> float:
+    """
+    Parse a currency string such as "$1,234.56" into a float.
+    
+    Cached, since flat-rate bills repeat the same amounts across many sub-accounts.
+    
+    Args:
+        amount: The amount string.
+        
+    Returns:
+        The amount as a float.
+        
+    Raises:
+        ValueError: If the string is not a valid amount.
+    """
+    # OCR and LLM output often ends in a newline or tab, which float() tolerates
+    cleaned = amount.translate(CURRENCY_STRIP).strip()
+    # Unlike float(), deliberately reject 'nan' and 'inf', which are never bill amounts
+    if not AMOUNT_RE.fullmatch(cleaned):
+        raise ValueError(f"Invalid amount: {amount!r}")
+    return float(cleaned)
+
+def is_missing(value: Any) -> bool:
+    """
+    Check whether an extracted field is absent.
+    
+    Only None and the empty string count as missing, so a zero amount such as
+    the float 0.0 from a zero-balance invoice is still present.
+    
+    Args:
+        value: The extracted field value.
+        
+    Returns:
+        True if the field is missing.
+    """
+    return value is None or value == ''
+
+def to_amount(value: Any) -> float:
+    """
+    Convert an extracted amount, numeric or currency string, into a float.
+    
+    Args:
+        value: The extracted amount.
+        
+    Returns:
+        The amount as a float.
+        
+    Raises:
+        ValueError: If the value is not a valid amount.
+    """
+    # Extracted amounts are usually already strings
+    if type(value) is str:
+        return parse_amount(value)
+    # bool is an int subclass, but True is never an amount of 1.0
+    if isinstance(value, bool):
+        raise ValueError(f"Invalid amount: {value!r}")
+    if isinstance(value, (int, float)):
+        # json.loads accepts a bare NaN or Infinity from the model
+        amount = float(value)
+        if not math.isfinite(amount):
+            raise ValueError(f"Invalid amount: {value!r}")
+        return amount
+    return parse_amount(str(value))
+
+# Master account fields an MLB must have, with their display names
+REQUIRED_MASTER_FIELDS = (
+    ('account_number', 'Account number'),
+    ('total_due', 'Amount due'),
+    ('due_date', 'Due date'),
+    ('vendor_name', 'Vendor name'),
+)
+
+# Fields perform_basic_validation requires, with the error reported when one is missing
+SLB_BASIC_REQUIRED_FIELDS = (
+    ('account_number', 'Account number is missing'),
+    ('invoice_date', 'Invoice date is missing'),
+    ('total_due', 'Total due is missing'),
+)
+MLB_BASIC_REQUIRED_FIELDS = (
+    ('account_number', 'Master account number is missing'),
+    ('invoice_date', 'Invoice date is missing'),
+    ('total_due', 'Total due is missing'),
+)
+
+# Due-date formats seen on bills, tried before falling back to dateutil
+DATE_FORMATS = ('%Y-%m-%d', '%m/%d/%Y', '%m-%d-%Y', '%b %d, %Y', '%B %d, %Y', '%d %b %Y')
+
+@functools.lru_cache(maxsize=4096)
+def parse_date(value: str) -> datetime:
+    """
+    Parse a date string, trying the known bill formats before the general dateutil parser.
+    
+    Cached, since bills in a batch often share the same due date.
+    
+    Args:
+        value: The date string.
+        
+    Returns:
+        The parsed datetime.
+        
+    Raises:
+        ValueError: If the string is not a recognizable date.
+    """
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            pass
+    return date_parser.parse(value)
+
+def sum_amounts(amounts: Iterable[float]) -> float:
+    """
+    Sum parsed amounts with math.fsum.
+    
+    fsum is exactly rounded, so float error never eats into the $0.02 totals
+    tolerance, and on a Python list it is faster than a NumPy array round-trip.
+    
+    Args:
+        amounts: The parsed amounts.
+        
+    Returns:
+        The total as a float.
+    """
+    return math.fsum(amounts)
+
 def validate_mlb_totals(data: Dict[str, Any]) -> Tuple[bool, float, float, List[Dict[str, str]]]:
     """
     Validate MLB totals by comparing master account total with sum of sub-account totals.
@@ -28,19 +166,30 @@ def validate_mlb_totals(data: Dict[str, Any]) -> Tuple[bool, float, float, List[
     """
     errors = []
     try:
-        # Get master account total
-        master_total = float(data.get('master_account', {}).get('total_due', '0').replace('$', '').replace(',', ''))
+        # Get master account total; the prebuilt-invoice amount is already numeric
+        master_total = to_amount(data.get('master_account', {}).get('total_due', '0'))
         
-        # Sum sub-account totals
-        sub_total = 0.0
-        for sub_account in data.get('sub_accounts', []):
+        # Parse each distinct sub-account total once and weight it by its count;
+        # flat-rate MLBs repeat the same charge across many locations
+        sub_accounts = data.get('sub_accounts', [])
+        counts = Counter(str(sub_account.get('total_due', '0')) for sub_account in sub_accounts)
+        weighted_totals = []
+        invalid_totals = set()
+        for amount, count in counts.items():
             try:
-                sub_total += float(sub_account.get('total_due', '0').replace('$', '').replace(',', ''))
-            except ValueError as e:
-                errors.append({
-                    'field': f'sub_accounts[{sub_account.get("sub_account_number", "Unknown")}].total_due',
-                    'error': f'Invalid sub-account total: {sub_account.get("total_due")}'
-                })
+                weighted_totals.append(parse_amount(amount) * count)
+            except ValueError:
+                invalid_totals.add(amount)
+        # Same exactly rounded sum validate_data uses, so both agree at the tolerance
+        sub_total = sum_amounts(weighted_totals)
+        
+        if invalid_totals:
+            for sub_account in sub_accounts:
+                if str(sub_account.get('total_due', '0')) in invalid_totals:
+                    errors.append({
+                        'field': f'sub_accounts[{sub_account.get("sub_account_number", "Unknown")}].total_due',
+                        'error': f'Invalid sub-account total: {sub_account.get("total_due")}'
+                    })
         
         # Check if totals match within $0.02 tolerance
         is_valid = abs(master_total - sub_total) <= 0.02
@@ -87,30 +236,34 @@ def validate_data(
     
     try:
         if bill_type == "MLB":
-            # Validate master account required fields
-            master_account = data.get('master_account', {})
-            required_master_fields = {
-                'account_number': 'Account number',
-                'total_due': 'Amount due',
-                'due_date': 'Due date',
-                'vendor_name': 'Vendor name'
-            }
+            # Without master account data none of the field checks below can pass
+            master_account = data.get('master_account')
+            if not master_account:
+                return {
+                    'valid': False,
+                    'errors': [{
+                        'field': 'master_account',
+                        'error': 'Missing master account data'
+                    }],
+                    'notes': notes
+                }
             
-            for field, display_name in required_master_fields.items():
-                if not master_account.get(field):
+            # Validate master account required fields
+            for field, display_name in REQUIRED_MASTER_FIELDS:
+                if is_missing(master_account.get(field)):
                     errors.append({
                         'field': f'master_account.{field}',
                         'error': f'Missing required field: {display_name}'
                     })
             
             # Validate data types and formats
-            if master_account.get('total_due'):
+            if not is_missing(master_account.get('total_due')):
                 try:
-                    amount = float(str(master_account['total_due']).replace('$', '').replace(',', ''))
-                    if amount < 0:
+                    master_total = to_amount(master_account['total_due'])
+                    if master_total < 0:
                         notes.append({
                             'field': 'master_account.total_due',
-                            'note': f'Negative total due amount: ${amount:.2f}'
+                            'note': f'Negative total due amount: ${master_total:.2f}'
                         })
                 except ValueError:
                     errors.append({
@@ -120,17 +273,18 @@ def validate_data(
             
             if master_account.get('due_date'):
                 try:
-                    # Try parsing the date in various formats
-                    from dateutil import parser
-                    parser.parse(str(master_account['due_date']))
+                    # Try the known formats first, then any format dateutil accepts
+                    parse_date(str(master_account['due_date']).strip())
                 except ValueError:
                     errors.append({
                         'field': 'master_account.due_date',
                         'error': f'Invalid date format: {master_account["due_date"]}'
                     })
             
-            # Validate sub-accounts
+            # Validate sub-accounts in one pass, keeping each parsed total for the
+            # totals check below
             sub_accounts = data.get('sub_accounts', [])
+            sub_totals = []
             if not sub_accounts:
                 errors.append({
                     'field': 'sub_accounts',
@@ -145,27 +299,25 @@ def validate_data(
                             'error': 'Missing sub-account number'
                         })
                     
-                    if not sub_account.get('total_due'):
+                    total_due = sub_account.get('total_due')
+                    if is_missing(total_due):
                         errors.append({
                             'field': f'sub_accounts[{i}].total_due',
                             'error': 'Missing total due amount'
                         })
                     else:
                         try:
-                            float(str(sub_account['total_due']).replace('$', '').replace(',', ''))
+                            sub_totals.append(to_amount(total_due))
                         except ValueError:
                             errors.append({
                                 'field': f'sub_accounts[{i}].total_due',
-                                'error': f'Invalid amount format: {sub_account["total_due"]}'
+                                'error': f'Invalid amount format: {total_due}'
                             })
             
-            # Calculate and verify totals
+            # Calculate and verify totals; with no errors the master total and every
+            # sub-account total were parsed above
             if not errors:
-                master_total = float(str(master_account['total_due']).replace('$', '').replace(',', ''))
-                sub_total = sum(
-                    float(str(sub['total_due']).replace('$', '').replace(',', ''))
-                    for sub in sub_accounts
-                )
+                sub_total = sum_amounts(sub_totals)
                 
                 if abs(master_total - sub_total) > 0.02:  # Allow for rounding differences
                     notes.append({
@@ -175,13 +327,13 @@ def validate_data(
         
         # Return validation results
         return {
-            'valid': len(errors) == 0,
+            'valid': not errors,
             'errors': errors,
             'notes': notes
         }
     
     except Exception as e:
-        logger.error(f"Error validating data: {str(e)}")
+        logger.error("Error validating data: %s", e)
         errors.append({
             'field': 'general',
             'error': f'Validation error: {str(e)}'
@@ -209,28 +361,24 @@ def perform_basic_validation(data: Dict[str, Any], bill_type: str) -> Dict[str,
     try:
         if bill_type == "SLB":
             # Validate SLB data
-            account = data.get('account', {})
-            
-            # Check account number
-            if not account.get('account_number'):
-                errors.append({
-                    'field': 'account.account_number',
-                    'error': 'Account number is missing'
-                })
+            account = data.get('account')
+            if not account:
+                return {
+                    'valid': False,
+                    'errors': [{
+                        'field': 'account',
+                        'error': 'Account data is missing'
+                    }],
+                    'warnings': warnings
+                }
             
-            # Check invoice date
-            if not account.get('invoice_date'):
-                errors.append({
-                    'field': 'account.invoice_date',
-                    'error': 'Invoice date is missing'
-                })
-            
-            # Check total due
-            if not account.get('total_due'):
-                errors.append({
-                    'field': 'account.total_due',
-                    'error': 'Total due is missing'
-                })
+            # Check required account fields
+            for field, message in SLB_BASIC_REQUIRED_FIELDS:
+                if is_missing(account.get(field)):
+                    errors.append({
+                        'field': f'account.{field}',
+                        'error': message
+                    })
             
             # Check line items
             line_items = data.get('line_items', [])
@@ -242,28 +390,24 @@ def perform_basic_validation(data: Dict[str, Any], bill_type: str) -> Dict[str,
             
         elif bill_type == "MLB":
             # Validate MLB data
-            master_account = data.get('master_account', {})
+            master_account = data.get('master_account')
+            if not master_account:
+                return {
+                    'valid': False,
+                    'errors': [{
+                        'field': 'master_account',
+                        'error': 'Master account data is missing'
+                    }],
+                    'warnings': warnings
+                }
             
-            # Check master account number
-            if not master_account.get('account_number'):
-                errors.append({
-                    'field': 'master_account.account_number',
-                    'error': 'Master account number is missing'
-                })
-            
-            # Check invoice date
-            if not master_account.get('invoice_date'):
-                errors.append({
-                    'field': 'master_account.invoice_date',
-                    'error': 'Invoice date is missing'
-                })
-            
-            # Check total due
-            if not master_account.get('total_due'):
-                errors.append({
-                    'field': 'master_account.total_due',
-                    'error': 'Total due is missing'
-                })
+            # Check required master account fields
+            for field, message in MLB_BASIC_REQUIRED_FIELDS:
+                if is_missing(master_account.get(field)):
+                    errors.append({
+                        'field': f'master_account.{field}',
+                        'error': message
+                    })
             
             # Check sub-accounts
             sub_accounts = data.get('sub_accounts', [])
@@ -302,7 +446,7 @@ def perform_basic_validation(data: Dict[str, Any], bill_type: str) -> Dict[str,
         })
     
     return {
-        'valid': len(errors) == 0,
+        'valid': not errors,
         'errors': errors,
         'warnings': warnings
     }
@@ -0,0 +1,55 @@
+"""
+Regression tests for the pure helpers in src.MLB_process.
+"""
+
+import pytest
+
+from src.MLB_process import apply_tags_to_content, parse_extraction, semantic_chunking
+
+
+def test_apply_tags_to_content_uses_original_offsets():
+    styles = [
+        {'fontWeight': 'bold', 'spans': [{'offset': 6, 'length': 5}, {'offset': 0, 'length': 5}]},
+        {'fontWeight': 'normal', 'spans': [{'offset': 12, 'length': 3}]},
+    ]
+    assert apply_tags_to_content("Hello world foo", styles) == "<b>Hello</b> <b>world</b> foo"
+
+
+def test_apply_tags_to_content_skips_overlapping_spans():
+    styles = [{'fontWeight': 'bold', 'spans': [{'offset': 0, 'length': 5}, {'offset': 3, 'length': 5}]}]
+    assert apply_tags_to_content("abcdefgh", styles) == "<b>abcde</b>fgh"
+
+
+def test_semantic_chunking_splits_on_service_locations():
+    content = "Summary\nService Location 1 of 2\nA\nService Location 2 of 2\nB"
+    chunks = [chunk.page_content for chunk in semantic_chunking({'content': content}, "bill")]
+    assert chunks == ["Summary", "Service Location 1 of 2\nA", "Service Location 2 of 2\nB"]
+
+
+def test_semantic_chunking_without_headers_keeps_whole_content():
+    chunks = semantic_chunking({'content': "  Only content \n"}, "bill")
+    assert [chunk.page_content for chunk in chunks] == ["Only content"]
+
+
+def test_parse_extraction_fills_missing_sections():
+    assert parse_extraction('{"master_account": null}') == ({}, [])
+    master, subs = parse_extraction('{"master_account": {"account_number": "1"}, "sub_accounts": [{"line_items": null}]}')
+    assert master == {"account_number": "1"}
+    assert subs == [{"line_items": None}]
+
+
+@pytest.mark.parametrize("response", [
+    '[]',
+    '{"master_account": "x"}',
+    '{"sub_accounts": {"a": 1}}',
+    '{"sub_accounts": [1]}',
+    '{"sub_accounts": [{"line_items": "x"}]}',
+])
+def test_parse_extraction_rejects_off_schema_responses(response):
+    with pytest.raises(ValueError):
+        parse_extraction(response)
+
+
+def test_parse_extraction_rejects_invalid_json():
+    with pytest.raises(ValueError):
+        parse_extraction('{"sub_accounts": [')
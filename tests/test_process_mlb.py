@@ -0,0 +1,139 @@
+"""
+Regression tests for the pure helpers in src.process_mlb.
+"""
+
+import asyncio
+import json
+
+import src.process_mlb as process_mlb
+from src.process_mlb import (
+    apply_tags_to_content,
+    correct_sub_account_totals,
+    preprocess_chunk,
+    semantic_chunking,
+)
+
+SUMMARY_LINE = "| Subtotal | Monthly | $10.00 | Taxes | $1.00 |"
+
+
+def chunk_contents(content):
+    return [chunk.page_content for chunk in semantic_chunking({'content': content}, "bill")]
+
+
+def test_semantic_chunking_splits_on_headers():
+    content = "Cover page\nLocation: 1 Main St\nCharges $5.00\nLocation: 2 Oak Ave\nCharges $7.00"
+    assert chunk_contents(content) == [
+        "Cover page",
+        "Location: 1 Main St\nCharges $5.00",
+        "Location: 2 Oak Ave\nCharges $7.00",
+    ]
+
+
+def test_semantic_chunking_truncates_before_master_summary():
+    content = f"Location: 1 Main St\nCharges $5.00\n{SUMMARY_LINE}\nLocation: 2 Oak Ave\nCharges $7.00"
+    assert chunk_contents(content) == [
+        "Location: 1 Main St\nCharges $5.00",
+        "Location: 2 Oak Ave\nCharges $7.00",
+    ]
+
+
+def test_semantic_chunking_finds_header_on_summary_line():
+    # The summary match is zero-width, so a header later on the same line still starts a chunk
+    content = "Location: 1 Main St\nCharges $5.00\n| Subtotal | Location: 2 Oak Ave | $10.00 | x | $1.00 |\nCharges $7.00"
+    chunks = chunk_contents(content)
+    assert chunks[0] == "Location: 1 Main St\nCharges $5.00"
+    assert chunks[1].startswith("Location: 2 Oak Ave")
+    assert len(chunks) == 2
+
+
+def test_semantic_chunking_summary_without_following_header():
+    content = f"Location: 1 Main St\nCharges $5.00\n{SUMMARY_LINE}\nTrailing totals"
+    assert chunk_contents(content) == ["Location: 1 Main St\nCharges $5.00"]
+
+
+def test_semantic_chunking_falls_back_to_paragraphs_without_headers():
+    content = "First paragraph\n\n  \n\nSecond paragraph\n"
+    assert chunk_contents(content) == ["First paragraph", "Second paragraph"]
+
+
+def test_semantic_chunking_applies_style_tags():
+    document = {
+        'content': "Location: 1 Main St",
+        'styles': [{'fontWeight': 'bold', 'spans': [{'offset': 10, 'length': 9}]}],
+    }
+    assert [chunk.page_content for chunk in semantic_chunking(document, "bill")] == ["Location: <b>1 Main St</b>"]
+
+
+def test_apply_tags_to_content_uses_original_offsets():
+    styles = [
+        {'fontWeight': 'bold', 'spans': [{'offset': 6, 'length': 5}, {'offset': 0, 'length': 5}]},
+        {'fontWeight': 'normal', 'spans': [{'offset': 12, 'length': 3}]},
+    ]
+    assert apply_tags_to_content("Hello world foo", styles) == "<b>Hello</b> <b>world</b> foo"
+
+
+def test_apply_tags_to_content_skips_overlapping_spans():
+    styles = [{'fontWeight': 'bold', 'spans': [{'offset': 0, 'length': 5}, {'offset': 3, 'length': 5}]}]
+    assert apply_tags_to_content("abcdefgh", styles) == "<b>abcde</b>fgh"
+
+
+def test_preprocess_chunk_bolds_each_account_number_once():
+    content = "Sub 123456789 and 987654321, again 123456789"
+    enhanced, first_account_number = preprocess_chunk(content)
+    assert enhanced == "Sub <b>123456789</b> and <b>987654321</b>, again <b>123456789</b>"
+    assert first_account_number == "123456789"
+
+
+def test_preprocess_chunk_bolds_labeled_accounts_but_not_zips_or_phones():
+    assert preprocess_chunk("Account #: AB-12")[0] == "Account #: <b>AB-12</b>"
+    assert preprocess_chunk("Account Number 30301")[0] == "Account Number 30301"
+    assert preprocess_chunk("Account No. 555-123-4567")[0] == "Account No. 555-123-4567"
+
+
+def test_preprocess_chunk_without_account_number():
+    assert preprocess_chunk("No numbers here") == ("No numbers here", None)
+
+
+def test_missing_sub_account_number_falls_back_to_chunk_account(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    sent = []
+
+    async def fake_llm_response(client, query, deployment_name, prompt_file, force_json):
+        sent.append(query)
+        return json.dumps({'sub_accounts': [
+            {'sub_account_number': 'Unknown', 'total_due': '$5.00'},
+            {'sub_account_number': '111111111', 'total_due': '$2.00'},
+        ]})
+
+    monkeypatch.setattr(process_mlb, "get_llm_response_async", fake_llm_response)
+    analysis_result = {'content': "Location: A\nSub 222222222 $5.00\nLocation: B\nNo charges"}
+    output = asyncio.run(process_mlb.process_mlb_async(
+        analysis_result, {}, "bill",
+        openai_endpoint="https://example", openai_api_key="key", deployment_name="model",
+        client=object()
+    ))
+    # The chunk with no digits is never sent
+    assert len(sent) == 1
+    assert [sub['sub_account_number'] for sub in output['sub_accounts']] == ['222222222', '111111111']
+
+
+def test_numeric_total_due_is_corrected_not_crashed():
+    sub_accounts = [
+        {'sub_account_number': '111111111', 'total_due': 99, 'line_items': [{'total': 1}]},
+        {'sub_account_number': '222222222', 'total_due': 12.5, 'line_items': [{'total': '$10.00'}, {'total': 2.5}]},
+        {'sub_account_number': '333333333', 'total_due': 0, 'line_items': []},
+    ]
+    correct_sub_account_totals(sub_accounts)
+    assert sub_accounts[0]['total_due'] == '$1.00'
+    assert sub_accounts[1]['total_due'] == 12.5
+    assert sub_accounts[2]['total_due'] == 0
+
+
+def test_blank_total_due_is_filled():
+    sub_accounts = [
+        {'sub_account_number': '111111111', 'total_due': '  ', 'line_items': [{'total': '$4.25'}]},
+        {'sub_account_number': '222222222', 'total_due': None},
+    ]
+    correct_sub_account_totals(sub_accounts)
+    assert sub_accounts[0]['total_due'] == '$4.25'
+    assert sub_accounts[1]['total_due'] == '$0.00'
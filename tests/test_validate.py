@@ -0,0 +1,89 @@
+"""
+Regression tests for src.validate.
+"""
+
+import pytest
+
+from src.validate import validate_data, validate_mlb_totals, perform_basic_validation, parse_amount, to_amount
+
+
+def zero_balance_mlb():
+    return {
+        'master_account': {
+            'account_number': '123456789',
+            'total_due': 0.0,
+            'due_date': '2024-10-01',
+            'vendor_name': 'Example Telecom',
+            'invoice_date': '2024-09-15'
+        },
+        'sub_accounts': [
+            {
+                'sub_account_number': '987654321',
+                'location': '1 Main St',
+                'total_due': '$0.00',
+                'line_items': [{'description': 'Service', 'total': '$0.00'}]
+            }
+        ]
+    }
+
+
+def test_zero_balance_mlb_is_valid():
+    result = validate_data(zero_balance_mlb(), "MLB")
+    assert result['valid'], result['errors']
+
+
+def test_zero_balance_mlb_passes_basic_validation():
+    result = perform_basic_validation(zero_balance_mlb(), "MLB")
+    assert result['valid'], result['errors']
+
+
+def test_missing_master_total_is_reported():
+    data = zero_balance_mlb()
+    data['master_account']['total_due'] = None
+    result = validate_data(data, "MLB")
+    assert not result['valid']
+    assert {'field': 'master_account.total_due', 'error': 'Missing required field: Amount due'} in result['errors']
+
+
+def test_parse_amount_tolerates_surrounding_whitespace():
+    assert parse_amount("$12.50\n") == 12.5
+    assert parse_amount("\t$1,234.56 ") == 1234.56
+
+
+def test_parse_amount_rejects_non_finite_values():
+    for amount in ("nan", "inf", "-inf"):
+        with pytest.raises(ValueError):
+            parse_amount(amount)
+
+
+def test_to_amount_rejects_non_finite_numbers():
+    for amount in (float('nan'), float('inf'), float('-inf')):
+        with pytest.raises(ValueError):
+            to_amount(amount)
+
+
+def test_to_amount_rejects_booleans():
+    for amount in (True, False):
+        with pytest.raises(ValueError):
+            to_amount(amount)
+
+
+def test_numeric_nan_sub_account_total_is_invalid():
+    data = zero_balance_mlb()
+    data['master_account']['total_due'] = 10.0
+    data['sub_accounts'][0]['total_due'] = float('nan')
+    result = validate_data(data, "MLB")
+    assert not result['valid']
+    assert result['errors'][0]['field'] == 'sub_accounts[0].total_due'
+
+
+def test_validators_agree_on_repeated_sub_account_totals():
+    data = zero_balance_mlb()
+    data['master_account']['total_due'] = 3.0
+    data['sub_accounts'] = [
+        {'sub_account_number': str(100000000 + i), 'total_due': '$0.10'} for i in range(30)
+    ]
+    is_valid, _, sub_total, errors = validate_mlb_totals(data)
+    assert is_valid, errors
+    assert sub_total == 3.0
+    assert validate_data(data, "MLB")['notes'] == []